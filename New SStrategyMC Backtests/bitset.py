@@ -0,0 +1,114 @@
+# Packed bitset signals
+#
+# Stores boolean per-bar conditions as uint64 words (64 bars per word) so
+# combining filters is a handful of bitwise word ops instead of one Python
+# object per bar.
+
+import numpy as np
+
+WORD_BITS = 64
+
+
+# ================= PACK / UNPACK =================
+def pack(mask):
+    """Pack a boolean array into little-endian uint64 words (bit i = bar i)."""
+    mask = np.asarray(mask, dtype=bool)
+    nbytes = -(-len(mask) // WORD_BITS) * 8
+    buf = np.zeros(nbytes, dtype=np.uint8)
+    packed = np.packbits(mask, bitorder="little")
+    buf[:len(packed)] = packed
+    return buf.view("<u8")
+
+
+def unpack(words, n):
+    """Expand packed words back into a boolean array of length n."""
+    words = np.ascontiguousarray(words, dtype="<u8")
+    return np.unpackbits(words.view(np.uint8), count=n, bitorder="little").view(bool)
+
+
+def tail_mask(n):
+    """Word mask that clears the padding bits past bar n."""
+    nwords = -(-n // WORD_BITS)
+    mask = np.full(nwords, np.uint64(0xFFFFFFFFFFFFFFFF), dtype="<u8")
+    rem = n % WORD_BITS
+    if rem:
+        mask[-1] = np.uint64((1 << rem) - 1)
+    return mask
+
+
+# ================= COMBINE =================
+def and_all(packed):
+    """Bitwise AND of a sequence of packed conditions."""
+    packed = list(packed)
+    out = packed[0].copy()
+    for words in packed[1:]:
+        np.bitwise_and(out, words, out=out)
+    return out
+
+
+def or_all(packed):
+    """Bitwise OR of a sequence of packed conditions."""
+    packed = list(packed)
+    out = packed[0].copy()
+    for words in packed[1:]:
+        np.bitwise_or(out, words, out=out)
+    return out
+
+
+def invert(words, n):
+    """Bitwise NOT, keeping the padding bits past bar n cleared."""
+    return np.bitwise_and(np.invert(words), tail_mask(n))
+
+
+# ================= SCAN =================
+def count(words):
+    """Number of set bars."""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(np.ascontiguousarray(words).view(np.uint8)).sum())
+
+
+def to_indices(words):
+    """Bar indices of every set bit, in ascending order.
+
+    Only non-zero words are expanded, so sparse signals (a few entries a
+    day) cost roughly one pass over the words.
+    """
+    words = np.ascontiguousarray(words, dtype="<u8")
+    nz = np.flatnonzero(words)
+    if len(nz) == 0:
+        return np.empty(0, dtype=np.int64)
+    bits = np.unpackbits(words[nz].view(np.uint8), bitorder="little").reshape(-1, WORD_BITS)
+    row, col = np.nonzero(bits)
+    return nz[row].astype(np.int64) * WORD_BITS + col
+
+
+def combine_subsets(packed, subsets):
+    """AND many filter subsets, sharing the work of common prefixes.
+
+    packed:  dict of name -> packed words
+    subsets: iterable of name sequences
+
+    Returns a dict of tuple(names) -> packed words. Names are combined in
+    the order given, so subsets listed with a common leading set of filters
+    reuse the intermediate result instead of recomputing it.
+    """
+    cache = {}
+    out = {}
+    for names in subsets:
+        names = tuple(names)
+        words = None
+        for k in range(len(names), 0, -1):
+            if names[:k] in cache:
+                words = cache[names[:k]]
+                start = k
+                break
+        if words is None:
+            words = packed[names[0]]
+            start = 1
+        for k in range(start, len(names)):
+            words = np.bitwise_and(words, packed[names[k]])
+            cache[names[:k + 1]] = words
+        cache[names] = words
+        out[names] = words
+    return out
@@ -0,0 +1,75 @@
+# Candle store
+#
+# One directory per symbol / timeframe, one .npy file per column, opened
+# memory-mapped so readers only page in the rows they actually touch.
+#
+#   candles/BTCUSDT/1m/time.npy   (int64 ns since epoch, sorted)
+#   candles/BTCUSDT/1m/open.npy ... volume.npy
+
+import os
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = "candles"
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def series_dir(root, symbol, timeframe):
+    return os.path.join(root, symbol.replace("/", "_"), timeframe)
+
+
+def write_series(root, symbol, timeframe, df, time_col="open_time"):
+    """Store an OHLC(V) DataFrame; missing columns are simply not written."""
+    path = series_dir(root, symbol, timeframe)
+    os.makedirs(path, exist_ok=True)
+
+    df = df.sort_values(time_col)
+    times = pd.to_datetime(df[time_col]).to_numpy().astype("datetime64[ns]").astype(np.int64)
+    np.save(os.path.join(path, "time.npy"), times)
+    for col in COLUMNS:
+        if col in df:
+            np.save(os.path.join(path, f"{col}.npy"), df[col].to_numpy(dtype=np.float64))
+    return path
+
+
+def import_csv(csv_file, root, symbol, timeframe, time_col="open_time"):
+    """e.g. import_csv("btcusd.csv", STORE_DIR, "BTCUSDT", "5m") for getCSV.py output."""
+    return write_series(root, symbol, timeframe, pd.read_csv(csv_file), time_col)
+
+
+def open_series(root, symbol, timeframe):
+    """Lazily opened columns: dict of name -> read-only memmap."""
+    path = series_dir(root, symbol, timeframe)
+    if not os.path.exists(os.path.join(path, "time.npy")):
+        raise FileNotFoundError(f"No candles stored for {symbol} {timeframe} under {root}")
+    series = {"time": np.load(os.path.join(path, "time.npy"), mmap_mode="r")}
+    for col in COLUMNS:
+        file = os.path.join(path, f"{col}.npy")
+        if os.path.exists(file):
+            series[col] = np.load(file, mmap_mode="r")
+    return series
+
+
+def list_symbols(root, timeframe):
+    if not os.path.isdir(root):
+        return []
+    return sorted(s for s in os.listdir(root) if os.path.isdir(os.path.join(root, s, timeframe)))
+
+
+def row_range(series, start, end):
+    """[lo, hi) row bounds of bars with start <= time < end (binary search on the memmap)."""
+    times = series["time"]
+    start = np.asarray(start).astype("datetime64[ns]").astype(np.int64)
+    end = np.asarray(end).astype("datetime64[ns]").astype(np.int64)
+    return np.searchsorted(times, start, side="left"), np.searchsorted(times, end, side="left")
+
+
+def load_window(series, start=None, end=None):
+    """Materialize one time window as a DataFrame indexed by open_time."""
+    times = series["time"]
+    lo = 0 if start is None else int(row_range(series, start, start)[0])
+    hi = len(times) if end is None else int(row_range(series, end, end)[0])
+    df = pd.DataFrame({col: np.asarray(series[col][lo:hi]) for col in series if col != "time"})
+    df.index = pd.DatetimeIndex(np.asarray(times[lo:hi]).astype("datetime64[ns]"), name="open_time")
+    return df
@@ -0,0 +1,158 @@
+# Transaction cost models for trade arrays
+#
+# A cost model is a dict of rates plus the list of components to charge.
+# Each component turns a whole trade array (engine.TRADE_DTYPE, one row
+# per exit leg) into a per-row cost in account currency, so net-of-cost
+# results are a handful of array operations - cheap enough to apply to
+# every grid point of a sweep.
+#
+#   net = costs.apply_costs(trades, ind, costs.CRYPTO_COSTS)
+#
+# Costs are applied after the simulation: the engine's daily-loss limit
+# still sees gross PnL.
+
+import numpy as np
+
+from engine import EXIT_SL, EXIT_TP, EXIT_TP1
+
+# ================= MODELS =================
+CRYPTO_COSTS = {
+    "components": ("fees", "spread", "slippage"),
+    "maker_fee": 0.0002,
+    "taker_fee": 0.00075,        # bot1: 0.075% per side
+    "entry_taker": True,         # entries are market orders at the signal close
+    "maker_exits": (EXIT_TP1, EXIT_TP),   # TP legs rest as limits; SL legs are stops (taker)
+    "spread_frac": 0.05,         # quoted spread as a share of the bar's high - low
+    "min_spread": 0.01,
+    "impact_coef": 0.1,          # slippage = coef * range * sqrt(size / bar volume)
+}
+
+# NSE index options, charged on premium turnover (rates as of FY2024-25)
+NSE_OPTIONS_COSTS = {
+    "components": ("nse_options", "spread", "slippage"),
+    "entry_taker": True,
+    "maker_exits": (EXIT_TP1, EXIT_TP),
+    "spread_frac": 0.05,
+    "min_spread": 0.05,          # one tick
+    "impact_coef": 0.1,
+    "brokerage": 20.0,           # INR per executed order
+    "stt_sell": 0.001,           # on sell-side premium
+    "exchange_fee": 0.0003503,   # NSE transaction charges, both sides
+    "sebi_fee": 1e-6,            # INR 10 / crore
+    "stamp_buy": 0.00003,        # on buy-side premium
+    "gst": 0.18,                 # on brokerage + exchange + SEBI fees
+}
+
+
+def make_costs(model=None, **overrides):
+    cfg = dict(CRYPTO_COSTS if model is None else model)
+    cfg.update(overrides)
+    return cfg
+
+
+# ================= LEGS =================
+def legs(trades, model):
+    """Per-row entry / exit arrays the components share.
+
+    Partial-TP rows split one entry order across several rows by size, so
+    proportional charges add up to the order's; per-order charges
+    (brokerage) only count the entry on the trade's first row.
+    """
+    side = trades["side"].astype(np.float64)
+    size = trades["size"]
+    _, first = np.unique(trades["trade_id"], return_index=True)
+    first_row = np.zeros(len(trades), dtype=bool)
+    first_row[first] = True
+    exit_taker = ~np.isin(trades["reason"], model.get("maker_exits", ()))
+    entry_taker = np.full(len(trades), bool(model.get("entry_taker", True)))
+    return {
+        "entry_notional": np.abs(trades["entry_price"] * size),
+        "exit_notional": np.abs(trades["exit_price"] * size),
+        "entry_is_buy": side > 0,
+        "entry_taker": entry_taker,
+        "exit_taker": exit_taker,
+        "first_row": first_row,
+    }
+
+
+# ================= COMPONENTS =================
+# each component(trades, leg, market, model) -> cost per row (>= 0)
+def fee_cost(trades, leg, market, model):
+    entry_rate = np.where(leg["entry_taker"], model["taker_fee"], model["maker_fee"])
+    exit_rate = np.where(leg["exit_taker"], model["taker_fee"], model["maker_fee"])
+    return leg["entry_notional"] * entry_rate + leg["exit_notional"] * exit_rate
+
+
+def _bar_range(market, idx):
+    return market["high"][idx] - market["low"][idx]
+
+
+def spread_cost(trades, leg, market, model):
+    """Half the estimated spread per taker leg; the spread is a share of the bar range."""
+    size = np.abs(trades["size"])
+    cost = np.zeros(len(trades))
+    for idx_field, taker in (("entry_idx", leg["entry_taker"]), ("exit_idx", leg["exit_taker"])):
+        spread = np.maximum(model["spread_frac"] * _bar_range(market, trades[idx_field]), model["min_spread"])
+        cost += np.where(taker, 0.5 * spread * size, 0.0)
+    return cost
+
+
+def slippage_cost(trades, leg, market, model):
+    """Square-root impact of taker legs on their bar's volume (no volume column -> 0)."""
+    volume = market.get("volume")
+    if volume is None:
+        return np.zeros(len(trades))
+    size = np.abs(trades["size"])
+    cost = np.zeros(len(trades))
+    for idx_field, taker in (("entry_idx", leg["entry_taker"]), ("exit_idx", leg["exit_taker"])):
+        idx = trades[idx_field]
+        bar_volume = volume[idx]
+        participation = np.divide(size, bar_volume, out=np.ones(len(trades)), where=bar_volume > 0)
+        impact = model["impact_coef"] * _bar_range(market, idx) * np.sqrt(np.minimum(participation, 1.0))
+        cost += np.where(taker, impact * size, 0.0)
+    return cost
+
+
+def nse_option_charges(trades, leg, market, model):
+    """Brokerage, STT, exchange / SEBI fees, stamp duty and GST on premium turnover."""
+    entry, exit_ = leg["entry_notional"], leg["exit_notional"]
+    buy_turnover = np.where(leg["entry_is_buy"], entry, exit_)
+    sell_turnover = np.where(leg["entry_is_buy"], exit_, entry)
+    turnover = entry + exit_
+    orders = leg["first_row"] + 1.0       # entry order once per trade, one exit order per row
+
+    brokerage = model["brokerage"] * orders
+    exchange = model["exchange_fee"] * turnover
+    sebi = model["sebi_fee"] * turnover
+    stt = model["stt_sell"] * sell_turnover
+    stamp = model["stamp_buy"] * buy_turnover
+    return brokerage + exchange + sebi + stt + stamp + model["gst"] * (brokerage + exchange + sebi)
+
+
+COMPONENTS = {
+    "fees": fee_cost,
+    "spread": spread_cost,
+    "slippage": slippage_cost,
+    "nse_options": nse_option_charges,
+}
+
+
+# ================= APPLY =================
+def trade_costs(trades, market, model=None):
+    """{component: per-row cost} for a trade array.
+
+    market: dict of bar arrays indexed by entry_idx / exit_idx - high and
+    low (and volume, if available); the indicator dict from
+    ict_strategy.compute_indicators works as is.
+    """
+    model = make_costs(model)
+    leg = legs(trades, model)
+    return {name: COMPONENTS[name](trades, leg, market, model) for name in model["components"]}
+
+
+def apply_costs(trades, market, model=None):
+    """Copy of trades with pnl net of every cost component."""
+    out = trades.copy()
+    if len(trades):
+        out["pnl"] = trades["pnl"] - sum(trade_costs(trades, market, model).values())
+    return out
@@ -0,0 +1,106 @@
+# EMA strategy rules (backtests/bot1_backtest.py, backtests/bot3_backtest1.py)
+#
+# The one copy of both trading rules. multipath.py runs them over many
+# bootstrapped paths, ensemble.py inside the strategy book and
+# backtests/portfolio.py across a symbol universe. Inputs are
+# (rows x bars) arrays - one row per path or series - and the bot3 loop is
+# a compiled kernel that walks every row in one call.
+
+import numpy as np
+
+from jit import njit, kernel_args
+
+EXIT_STOP = 0
+EXIT_REVERSE = 1
+
+
+# ================= SIGNALS =================
+def volume_spike_signal(fast, slow, vol_ratio, ratio):
+    """bot3's signal: +1 / -1 on the side of the EMA cross when volume spikes, else 0."""
+    spike = np.asarray(vol_ratio) > ratio
+    fast, slow = np.asarray(fast), np.asarray(slow)
+    return np.where((fast > slow) & spike, 1, np.where((fast < slow) & spike, -1, 0)).astype(np.int8)
+
+
+# ================= EMA CROSSOVER (bot1) =================
+def crossover_returns(close, fast, slow, cost):
+    """bot1's always-in-market per-bar returns, net of `cost` on every flip.
+
+    The position follows the previous bar's EMA cross. Returns (returns,
+    flips) - returns is NaN on the first bar, flips marks the bars where
+    the position changed.
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    cross = np.where(np.atleast_2d(fast) > np.atleast_2d(slow), 1.0, -1.0)
+    position = np.full(close.shape, np.nan)
+    position[:, 1:] = cross[:, :-1]
+    ret = np.full(close.shape, np.nan)
+    ret[:, 1:] = position[:, 1:] * (close[:, 1:] / close[:, :-1] - 1)
+    flips = np.nan_to_num(np.diff(position, axis=1, prepend=np.nan)) != 0
+    ret[flips] -= cost
+    return ret, flips
+
+
+# ================= STOP / REVERSE (bot3) =================
+@njit(cache=True, nogil=True)
+def _stop_reverse(close, signal, stop_pct, out):
+    """Every row's closed trades -> out[k] = (row, entry_idx, exit_idx, side, reason); returns the count."""
+    k = 0
+    for p in range(len(close)):
+        price_row = close[p]
+        signal_row = signal[p]
+        side = 0
+        entry = 0.0
+        entry_idx = 0
+        for i in range(len(price_row)):
+            price = price_row[i]
+            sig = signal_row[i]
+            if (side == 1 and price <= entry * (1 - stop_pct)) or (side == -1 and price >= entry * (1 + stop_pct)):
+                out[k, 0] = p
+                out[k, 1] = entry_idx
+                out[k, 2] = i
+                out[k, 3] = side
+                out[k, 4] = EXIT_STOP
+                k += 1
+                side = 0
+            if side == 0:
+                if sig != 0:
+                    side = sig
+                    entry = price
+                    entry_idx = i
+            elif sig == -side:
+                out[k, 0] = p
+                out[k, 1] = entry_idx
+                out[k, 2] = i
+                out[k, 3] = side
+                out[k, 4] = EXIT_REVERSE
+                k += 1
+                side = sig
+                entry = price
+                entry_idx = i
+    return k
+
+
+def stop_reverse_trades(close, signal, stop_pct):
+    """bot3's closed trades for every row of close / signal.
+
+    Entries and exits fill at the bar close; a stop is checked before the
+    signal, and an opposite signal closes and reverses. A position still
+    open at the last bar is not a trade. Returns a dict of arrays, one entry
+    per trade in row order: row, entry_idx, exit_idx, side, entry_price,
+    exit_price, reason (EXIT_STOP / EXIT_REVERSE).
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    signal = np.atleast_2d(np.asarray(signal, dtype=np.int64))
+    out = np.zeros((np.count_nonzero(signal), 5), dtype=np.int64)     # every trade enters on its own signal bar
+    k = _stop_reverse(*kernel_args(close, signal), float(stop_pct), out)
+    row, entry_idx, exit_idx, side, reason = out[:k].T
+    return {
+        "row": row,
+        "entry_idx": entry_idx,
+        "exit_idx": exit_idx,
+        "side": side,
+        "entry_price": close[row, entry_idx],
+        "exit_price": close[row, exit_idx],
+        "reason": reason,
+    }
@@ -0,0 +1,584 @@
+# Array-based trade state machine for the ICT backtests
+#
+# Same entry / SL / TP1-TP2 partial / breakeven / daily-limit rules as the
+# iterrows loops in test1.py - test6.py, run over plain NumPy arrays.
+
+import numpy as np
+
+from jit import njit, kernel_args
+
+# ================= CONFIG =================
+DEFAULT_CONFIG = {
+    "lot_size": 0.05,
+    "sl_mode": "atr",            # "atr" -> close -/+ atr * atr_sl_mult, "range" -> range_low / range_high
+    "atr_sl_mult": 1.5,
+    "partial_tp": True,          # False -> single target at rr
+    "rr": 2.0,
+    "tp1_r": 1.0,
+    "tp2_r": 2.0,
+    "partial_size": 0.33,
+    "daily_limits": True,
+    "max_daily_loss": 1.0,
+    "max_trades_per_day": 2,
+    "close_at_end": False,       # True -> a position open at the last bar exits at its close (EXIT_END)
+}
+
+LONG = 1
+SHORT = -1
+
+EXIT_SL = 0
+EXIT_TP1 = 1
+EXIT_TP = 2
+EXIT_END = 3
+
+# one row per exit leg; a partial TP position produces two rows with the same trade_id
+TRADE_DTYPE = np.dtype([
+    ("trade_id", "i8"),
+    ("side", "i1"),
+    ("entry_idx", "i8"),
+    ("exit_idx", "i8"),
+    ("entry_price", "f8"),
+    ("exit_price", "f8"),
+    ("stop", "f8"),
+    ("target", "f8"),
+    ("size", "f8"),
+    ("pnl", "f8"),
+    ("reason", "i1"),
+])
+
+_I_FIELDS = ("trade_id", "side", "entry_idx", "exit_idx", "reason")
+_F_FIELDS = ("entry_price", "exit_price", "stop", "target", "size", "pnl")
+
+
+def make_config(config=None, **overrides):
+    cfg = dict(DEFAULT_CONFIG)
+    if config:
+        cfg.update(config)
+    cfg.update(overrides)
+    return cfg
+
+
+def day_index(timestamps):
+    """Calendar day number (UTC) of each bar, used for the daily limits."""
+    ts = np.asarray(timestamps).astype("datetime64[ns]")
+    return ts.astype("datetime64[D]").astype(np.int64)
+
+
+def stop_levels(close, atr, cfg, range_low=None, range_high=None):
+    """Per-bar stop price a long / short entry on that bar would use."""
+    if cfg["sl_mode"] == "range":
+        return np.asarray(range_low, dtype=np.float64), np.asarray(range_high, dtype=np.float64)
+    return close - atr * cfg["atr_sl_mult"], close + atr * cfg["atr_sl_mult"]
+
+
+def trade_args(cfg):
+    """Scalar kernel arguments for a config (targets are in R multiples)."""
+    if cfg["partial_tp"]:
+        tp1_r, tp2_r, partial = cfg["tp1_r"], cfg["tp2_r"], True
+    else:
+        tp1_r, tp2_r, partial = cfg["rr"], cfg["rr"], False
+    return (
+        float(cfg["lot_size"]), float(tp1_r), float(tp2_r), partial,
+        float(cfg["partial_size"]), bool(cfg["daily_limits"]),
+        float(cfg["max_daily_loss"]), int(cfg["max_trades_per_day"]), bool(cfg["close_at_end"]),
+    )
+
+
+def empty_buffers(n_signals):
+    cap = 2 * int(n_signals) + 2
+    return np.zeros((cap, len(_I_FIELDS)), dtype=np.int64), np.zeros((cap, len(_F_FIELDS)), dtype=np.float64)
+
+
+def to_records(out_i, out_f, n):
+    trades = np.zeros(n, dtype=TRADE_DTYPE)
+    for k, name in enumerate(_I_FIELDS):
+        trades[name] = out_i[:n, k]
+    for k, name in enumerate(_F_FIELDS):
+        trades[name] = out_f[:n, k]
+    return trades
+
+
+# ================= KERNEL =================
+@njit(cache=True, nogil=True)
+def _record(out_i, out_f, k, trade_id, side, entry_idx, exit_idx, reason,
+            entry, exit_price, stop, target, size, pnl):
+    out_i[k, 0] = trade_id
+    out_i[k, 1] = side
+    out_i[k, 2] = entry_idx
+    out_i[k, 3] = exit_idx
+    out_i[k, 4] = reason
+    out_f[k, 0] = entry
+    out_f[k, 1] = exit_price
+    out_f[k, 2] = stop
+    out_f[k, 3] = target
+    out_f[k, 4] = size
+    out_f[k, 5] = pnl
+
+
+@njit(cache=True, nogil=True)
+def _close_at_end(out_i, out_f, k, trade_id, side, entry_idx, last, entry, price, stop, target, size):
+    pnl = (price - entry) * size * side
+    _record(out_i, out_f, k, trade_id, side, entry_idx, last, EXIT_END,
+            entry, price, stop, target, size, pnl)
+    return k + 1
+
+
+@njit(cache=True, nogil=True)
+def _run_bars(high, low, close, sl_long, sl_short, long_sig, short_sig, day, tp_first,
+              lot, tp1_r, tp2_r, partial, partial_size,
+              daily_limits, max_loss, max_trades, close_at_end, out_i, out_f):
+    n = len(close)
+    k = 0
+    trade_id = -1
+    side = 0
+    entry = sl = tp1 = tp2 = 0.0
+    size_remaining = 0.0
+    tp1_done = False
+    entry_idx = 0
+    current_day = -(2 ** 62)
+    daily_pnl = 0.0
+    daily_trades = 0
+
+    for i in range(n):
+        if day[i] != current_day:
+            current_day = day[i]
+            daily_pnl = 0.0
+            daily_trades = 0
+
+        if daily_limits and (daily_pnl <= -max_loss or daily_trades >= max_trades):
+            continue
+
+        # ===== ENTRY =====
+        if side == 0:
+            if long_sig[i]:
+                side = 1
+                entry = close[i]
+                sl = sl_long[i]
+                tp1 = entry + (entry - sl) * tp1_r
+                tp2 = entry + (entry - sl) * tp2_r
+            elif short_sig[i]:
+                side = -1
+                entry = close[i]
+                sl = sl_short[i]
+                tp1 = entry - (sl - entry) * tp1_r
+                tp2 = entry - (sl - entry) * tp2_r
+            else:
+                continue
+            size_remaining = lot
+            tp1_done = not partial
+            entry_idx = i
+            trade_id += 1
+            daily_trades += 1
+
+        # ===== MANAGEMENT =====
+        elif side == 1:
+            target = tp2 if tp1_done else tp1
+            if low[i] <= sl and not (tp_first[i] and (high[i] >= tp2 or (not tp1_done and high[i] >= tp1))):
+                pnl = (sl - entry) * size_remaining
+                _record(out_i, out_f, k, trade_id, 1, entry_idx, i, 0,
+                        entry, sl, sl, target, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+            elif not tp1_done and high[i] >= tp1:
+                pnl = (tp1 - entry) * (lot * partial_size)
+                _record(out_i, out_f, k, trade_id, 1, entry_idx, i, 1,
+                        entry, tp1, sl, tp1, lot * partial_size, pnl)
+                k += 1
+                daily_pnl += pnl
+                size_remaining *= (1 - partial_size)
+                sl = entry
+                tp1_done = True
+            elif high[i] >= tp2:
+                pnl = (tp2 - entry) * size_remaining
+                _record(out_i, out_f, k, trade_id, 1, entry_idx, i, 2,
+                        entry, tp2, sl, tp2, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+
+        else:
+            target = tp2 if tp1_done else tp1
+            if high[i] >= sl and not (tp_first[i] and (low[i] <= tp2 or (not tp1_done and low[i] <= tp1))):
+                pnl = (entry - sl) * size_remaining
+                _record(out_i, out_f, k, trade_id, -1, entry_idx, i, 0,
+                        entry, sl, sl, target, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+            elif not tp1_done and low[i] <= tp1:
+                pnl = (entry - tp1) * (lot * partial_size)
+                _record(out_i, out_f, k, trade_id, -1, entry_idx, i, 1,
+                        entry, tp1, sl, tp1, lot * partial_size, pnl)
+                k += 1
+                daily_pnl += pnl
+                size_remaining *= (1 - partial_size)
+                sl = entry
+                tp1_done = True
+            elif low[i] <= tp2:
+                pnl = (entry - tp2) * size_remaining
+                _record(out_i, out_f, k, trade_id, -1, entry_idx, i, 2,
+                        entry, tp2, sl, tp2, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+
+    if close_at_end and side != 0:
+        k = _close_at_end(out_i, out_f, k, trade_id, side, entry_idx, n - 1, entry, close[n - 1],
+                          sl, tp2 if tp1_done else tp1, size_remaining)
+    return k
+
+
+# ================= EVENT-SKIPPING KERNEL =================
+# Flat: jump straight to the next candidate signal bar.
+# In position: locate the first bar that touches the stop or a target with
+# block extremes (BLOCK bars per block) and a sparse table over the blocks,
+# i.e. O(BLOCK + log n) per exit instead of one step per bar.
+
+BLOCK = 64
+
+
+def build_extremes(high, low, block=BLOCK):
+    """Flattened sparse tables of per-block min(low) / max(high).
+
+    Row l holds the extreme over blocks [b, b + 2**l); rows are stored one
+    after another, nb entries each.
+    """
+    n = len(low)
+    nb = max(-(-n // block), 1)
+    pad = nb * block - n
+    lo = np.concatenate([low, np.full(pad, np.inf)]).reshape(nb, block)
+    hi = np.concatenate([high, np.full(pad, -np.inf)]).reshape(nb, block)
+    tmin = [np.fmin.reduce(lo, axis=1)]
+    tmax = [np.fmax.reduce(hi, axis=1)]
+    span = 1
+    while 2 * span <= nb:
+        prev_min, prev_max = tmin[-1], tmax[-1]
+        row_min = np.full(nb, np.inf)
+        row_max = np.full(nb, -np.inf)
+        row_min[:nb - span] = np.fmin(prev_min[:nb - span], prev_min[span:])
+        row_max[:nb - span] = np.fmax(prev_max[:nb - span], prev_max[span:])
+        tmin.append(row_min)
+        tmax.append(row_max)
+        span *= 2
+    return np.concatenate(tmin), np.concatenate(tmax), nb
+
+
+def next_day_starts(day):
+    """For each bar, the index of the first bar of the following day."""
+    n = len(day)
+    new_day = np.empty(n, dtype=bool)
+    new_day[:1] = True
+    new_day[1:] = day[1:] != day[:-1]
+    starts = np.flatnonzero(new_day)
+    day_id = np.cumsum(new_day) - 1
+    return np.append(starts[1:], n)[day_id]
+
+
+def prepare_events(high, low, timestamps):
+    """Everything mode="events" precomputes from the bars alone.
+
+    Pass the result as `prepared` to reuse it across many runs on the same
+    data (sweeps), so each run only pays for its own trades.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    day = day_index(timestamps)
+    tmin, tmax, nb = build_extremes(high, low)
+    return {"day": day, "next_day": next_day_starts(day), "tmin": tmin, "tmax": tmax, "nb": nb}
+
+
+@njit(cache=True, nogil=True)
+def _first_low_at_or_below(low, tmin, nb, block, start, level):
+    n = len(low)
+    if start >= n:
+        return n
+    end = min((start // block + 1) * block, n)
+    for j in range(start, end):
+        if low[j] <= level:
+            return j
+    if end >= n:
+        return n
+    b = end // block
+    levels = len(tmin) // nb
+    for lv in range(levels - 1, -1, -1):
+        step = 1 << lv
+        if b + step <= nb and tmin[lv * nb + b] > level:
+            b += step
+    if b >= nb:
+        return n
+    for j in range(b * block, min((b + 1) * block, n)):
+        if low[j] <= level:
+            return j
+    return n
+
+
+@njit(cache=True, nogil=True)
+def _first_high_at_or_above(high, tmax, nb, block, start, level):
+    n = len(high)
+    if start >= n:
+        return n
+    end = min((start // block + 1) * block, n)
+    for j in range(start, end):
+        if high[j] >= level:
+            return j
+    if end >= n:
+        return n
+    b = end // block
+    levels = len(tmax) // nb
+    for lv in range(levels - 1, -1, -1):
+        step = 1 << lv
+        if b + step <= nb and tmax[lv * nb + b] < level:
+            b += step
+    if b >= nb:
+        return n
+    for j in range(b * block, min((b + 1) * block, n)):
+        if high[j] >= level:
+            return j
+    return n
+
+
+@njit(cache=True, nogil=True)
+def _run_events(high, low, close, sl_long, sl_short, signal_idx, long_sig, day, next_day, tp_first,
+                tmin, tmax, nb, block,
+                lot, tp1_r, tp2_r, partial, partial_size,
+                daily_limits, max_loss, max_trades, close_at_end, out_i, out_f):
+    n = len(close)
+    n_sig = len(signal_idx)
+    p = 0
+    k = 0
+    trade_id = -1
+    side = 0
+    entry = sl = tp1 = tp2 = 0.0
+    size_remaining = 0.0
+    tp1_done = False
+    entry_idx = 0
+    current_day = -(2 ** 62)
+    daily_pnl = 0.0
+    daily_trades = 0
+
+    i = 0
+    while i < n:
+        if side == 0:
+            while p < n_sig and signal_idx[p] < i:
+                p += 1
+            if p == n_sig:
+                break
+            j = signal_idx[p]
+        else:
+            # stop, then the first target that can trigger
+            if side == 1:
+                j_sl = _first_low_at_or_below(low, tmin, nb, block, i, sl)
+                j_tp = _first_high_at_or_above(high, tmax, nb, block, i, tp2)
+                if not tp1_done:
+                    j_tp = min(j_tp, _first_high_at_or_above(high, tmax, nb, block, i, tp1))
+            else:
+                j_sl = _first_high_at_or_above(high, tmax, nb, block, i, sl)
+                j_tp = _first_low_at_or_below(low, tmin, nb, block, i, tp2)
+                if not tp1_done:
+                    j_tp = min(j_tp, _first_low_at_or_below(low, tmin, nb, block, i, tp1))
+            j = min(j_sl, j_tp)
+            if j >= n:
+                break
+
+        # day bookkeeping only changes at the bar we land on
+        if day[j] != current_day:
+            current_day = day[j]
+            daily_pnl = 0.0
+            daily_trades = 0
+        if daily_limits and (daily_pnl <= -max_loss or daily_trades >= max_trades):
+            # the rest of the day is skipped, even while in a position
+            i = next_day[j]
+            continue
+
+        if side == 0:
+            if long_sig[j]:
+                side = 1
+                entry = close[j]
+                sl = sl_long[j]
+                tp1 = entry + (entry - sl) * tp1_r
+                tp2 = entry + (entry - sl) * tp2_r
+            else:
+                side = -1
+                entry = close[j]
+                sl = sl_short[j]
+                tp1 = entry - (sl - entry) * tp1_r
+                tp2 = entry - (sl - entry) * tp2_r
+            size_remaining = lot
+            tp1_done = not partial
+            entry_idx = j
+            trade_id += 1
+            daily_trades += 1
+
+        elif side == 1:
+            target = tp2 if tp1_done else tp1
+            if low[j] <= sl and not (tp_first[j] and (high[j] >= tp2 or (not tp1_done and high[j] >= tp1))):
+                pnl = (sl - entry) * size_remaining
+                _record(out_i, out_f, k, trade_id, 1, entry_idx, j, 0,
+                        entry, sl, sl, target, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+            elif not tp1_done and high[j] >= tp1:
+                pnl = (tp1 - entry) * (lot * partial_size)
+                _record(out_i, out_f, k, trade_id, 1, entry_idx, j, 1,
+                        entry, tp1, sl, tp1, lot * partial_size, pnl)
+                k += 1
+                daily_pnl += pnl
+                size_remaining *= (1 - partial_size)
+                sl = entry
+                tp1_done = True
+            else:
+                pnl = (tp2 - entry) * size_remaining
+                _record(out_i, out_f, k, trade_id, 1, entry_idx, j, 2,
+                        entry, tp2, sl, tp2, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+
+        else:
+            target = tp2 if tp1_done else tp1
+            if high[j] >= sl and not (tp_first[j] and (low[j] <= tp2 or (not tp1_done and low[j] <= tp1))):
+                pnl = (entry - sl) * size_remaining
+                _record(out_i, out_f, k, trade_id, -1, entry_idx, j, 0,
+                        entry, sl, sl, target, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+            elif not tp1_done and low[j] <= tp1:
+                pnl = (entry - tp1) * (lot * partial_size)
+                _record(out_i, out_f, k, trade_id, -1, entry_idx, j, 1,
+                        entry, tp1, sl, tp1, lot * partial_size, pnl)
+                k += 1
+                daily_pnl += pnl
+                size_remaining *= (1 - partial_size)
+                sl = entry
+                tp1_done = True
+            else:
+                pnl = (entry - tp2) * size_remaining
+                _record(out_i, out_f, k, trade_id, -1, entry_idx, j, 2,
+                        entry, tp2, sl, tp2, size_remaining, pnl)
+                k += 1
+                daily_pnl += pnl
+                side = 0
+
+        i = j + 1
+
+    if close_at_end and side != 0:
+        k = _close_at_end(out_i, out_f, k, trade_id, side, entry_idx, n - 1, entry, close[n - 1],
+                          sl, tp2 if tp1_done else tp1, size_remaining)
+    return k
+
+
+# ================= PUBLIC API =================
+def run_backtest(high, low, close, atr, long_signal, short_signal, timestamps,
+                 config=None, range_low=None, range_high=None, mode="bars", prepared=None,
+                 tp_first=None):
+    """Run the ICT trade state machine over bar arrays.
+
+    Entries fill at the signal bar close; the bar after entry is the first
+    one managed. On a bar that touches both the stop and a target the stop
+    wins, as in the scripts. A position still open at the last bar is not
+    recorded, unless config["close_at_end"] closes it there (EXIT_END).
+
+    mode="bars" steps every bar; mode="events" only visits signal bars and
+    exit bars, so its cost scales with the number of trades. Both produce
+    identical trades. `prepared` (from prepare_events) skips the per-call
+    setup of the events mode. tp_first marks bars where intrabar data showed
+    the target was touched before the stop (see intrabar.py).
+
+    Returns a TRADE_DTYPE structured array with one row per exit leg, so
+    trades["pnl"] is exactly the `trades` list the scripts build.
+    """
+    cfg = make_config(config)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    long_signal = np.asarray(long_signal, dtype=bool)
+    short_signal = np.asarray(short_signal, dtype=bool)
+    day = day_index(timestamps) if prepared is None else prepared["day"]
+
+    sl_long, sl_short = stop_levels(close, atr, cfg, range_low, range_high)
+    out_i, out_f = empty_buffers(np.count_nonzero(long_signal | short_signal))
+    if tp_first is None:
+        tp_first = np.zeros(len(close), dtype=bool)
+    tp_first = np.asarray(tp_first, dtype=bool)
+
+    if mode == "bars":
+        n = _run_bars(
+            *kernel_args(high, low, close, sl_long, sl_short, long_signal, short_signal, day, tp_first),
+            *trade_args(cfg), out_i, out_f,
+        )
+    elif mode == "events":
+        if prepared is None:
+            prepared = prepare_events(high, low, timestamps)
+        signal_idx = np.flatnonzero(long_signal | short_signal)
+        n = _run_events(
+            *kernel_args(high, low, close, sl_long, sl_short, signal_idx, long_signal,
+                         day, prepared["next_day"], tp_first, prepared["tmin"], prepared["tmax"]),
+            prepared["nb"], BLOCK, *trade_args(cfg), out_i, out_f,
+        )
+    else:
+        raise ValueError(f"Unknown engine mode: {mode}")
+    return to_records(out_i, out_f, n)
+
+
+# ================= MANY PATHS =================
+@njit(cache=True, nogil=True)
+def _run_paths(high, low, close, sl_long, sl_short, long_sig, short_sig, day, tp_first, offsets,
+               lot, tp1_r, tp2_r, partial, partial_size,
+               daily_limits, max_loss, max_trades, close_at_end, out_i, out_f, counts):
+    """_run_bars on every row, each writing into its own slice of the buffers."""
+    for p in range(len(offsets) - 1):
+        lo = offsets[p]
+        hi = offsets[p + 1]
+        counts[p] = _run_bars(high[p], low[p], close[p], sl_long[p], sl_short[p], long_sig[p], short_sig[p],
+                              day, tp_first[p], lot, tp1_r, tp2_r, partial, partial_size,
+                              daily_limits, max_loss, max_trades, close_at_end, out_i[lo:hi], out_f[lo:hi])
+
+
+def run_backtest_paths(high, low, close, atr, long_signal, short_signal, timestamps,
+                       config=None, range_low=None, range_high=None, prepared=None, tp_first=None):
+    """run_backtest (mode="bars") over (paths x bars) arrays in one kernel call.
+
+    Every path shares the timestamps. Returns (trades, path): the trade
+    rows of all paths one path after another, and the path number of each.
+    """
+    cfg = make_config(config)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    long_signal = np.asarray(long_signal, dtype=bool)
+    short_signal = np.asarray(short_signal, dtype=bool)
+    day = day_index(timestamps) if prepared is None else prepared["day"]
+
+    sl_long, sl_short = stop_levels(close, atr, cfg, range_low, range_high)
+    tp_first = np.zeros(close.shape, dtype=bool) if tp_first is None else np.asarray(tp_first, dtype=bool)
+
+    caps = 2 * np.count_nonzero(long_signal | short_signal, axis=1) + 2
+    offsets = np.concatenate([[0], np.cumsum(caps)])
+    out_i = np.zeros((offsets[-1], len(_I_FIELDS)), dtype=np.int64)
+    out_f = np.zeros((offsets[-1], len(_F_FIELDS)), dtype=np.float64)
+    counts = np.zeros(len(close), dtype=np.int64)
+    _run_paths(
+        *kernel_args(high, low, close, sl_long, sl_short, long_signal, short_signal, day, tp_first, offsets),
+        *trade_args(cfg), out_i, out_f, counts,
+    )
+
+    rows = np.flatnonzero(np.arange(offsets[-1]) - np.repeat(offsets[:-1], caps) < np.repeat(counts, caps))
+    trades = to_records(out_i[rows], out_f[rows], len(rows))
+    return trades, np.repeat(np.arange(len(counts)), counts)
+
+
+def run_frame(df, config=None, mode="bars"):
+    """Convenience wrapper for a script-style DataFrame indexed by open_time."""
+    kwargs = {}
+    if "range_low" in df:
+        kwargs = {"range_low": df["range_low"].to_numpy(), "range_high": df["range_high"].to_numpy()}
+    return run_backtest(
+        df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(),
+        df["atr"].to_numpy(), df["long_signal"].to_numpy(), df["short_signal"].to_numpy(),
+        df.index.to_numpy(), config, mode=mode, **kwargs,
+    )
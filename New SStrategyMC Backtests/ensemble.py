@@ -0,0 +1,148 @@
+# Multi-strategy ensemble runner
+#
+# The three strategy families - EMA crossover (backtests/bot1_backtest.py),
+# EMA + volume spike (backtests/bot3_backtest1.py) and ICT (test*.py) - run
+# against one loaded dataset. Every strategy declares the indicators it
+# needs; the union is computed once and shared, then each strategy turns
+# them into a per-bar PnL series so results can be compared and combined.
+
+import numpy as np
+import pandas as pd
+
+import ema_strategies
+import ict_strategy
+
+# ================= CONFIG =================
+CAPITAL = 10000             # account size each strategy's PnL is expressed against
+FEE_RATE = 0.00075          # bot1: 0.075% per side
+SLIPPAGE_RATE = 0.0002      # bot1: 0.02% per trade
+VOLUME_SPIKE_RATIO = 1.5    # bot3
+STOP_LOSS_PCT = 0.01        # bot3
+POSITION_PCT = 1.0          # bot3 / ICT notional per trade as a share of CAPITAL (bot1 is fully invested)
+
+
+# ================= INDICATORS =================
+def _warm_up(series, bars):
+    """series with its first bars - 1 values masked (ewm's min_periods=bars, without a second pass)."""
+    out = series.copy()
+    out.iloc[:bars - 1] = np.nan
+    return out
+
+
+# each indicator(df, need) -> values; need(name) returns another indicator, computed once
+INDICATORS = {
+    # bot1: pandas ewm from the first bar
+    "ema12": lambda df, need: df["close"].ewm(span=12, adjust=False).mean(),
+    "ema20": lambda df, need: df["close"].ewm(span=20, adjust=False).mean(),
+    # bot3: ta's EMAIndicator - the same EMA, NaN until `window` bars
+    "ema12_ta": lambda df, need: _warm_up(need("ema12"), 12),
+    "ema20_ta": lambda df, need: _warm_up(need("ema20"), 20),
+    "vol_ratio": lambda df, need: df["volume"] / df["volume"].rolling(window=10).mean(),
+    "ict": lambda df, need: ict_strategy.compute_indicators(df),
+}
+
+
+def compute_indicators(df, names):
+    """Each named indicator (and any it is derived from) exactly once."""
+    ind = {}
+
+    def need(name):
+        if name not in ind:
+            ind[name] = INDICATORS[name](df, need)
+        return ind[name]
+
+    for name in sorted(set(names)):
+        need(name)
+    return ind
+
+
+# ================= STRATEGIES =================
+# each run(df, ind) -> (per-bar PnL Series on CAPITAL, number of trades)
+# PnL is sized against CAPITAL so the strategies are on one scale; trades
+# are counted as exit legs (a partial-TP trade counts twice), as
+# ict_strategy.summarize and the test scripts count them.
+def run_ema_crossover(df, ind):
+    ret, flips = ema_strategies.crossover_returns(df["close"], ind["ema12"], ind["ema20"],
+                                                  (FEE_RATE + SLIPPAGE_RATE) * 2)
+    equity = pd.Series(CAPITAL * np.cumprod(1 + np.nan_to_num(ret[0])), index=df.index)
+    return equity.diff().fillna(equity.iloc[0] - CAPITAL), int(flips.sum())
+
+
+def run_ema_volume(df, ind):
+    signal = ema_strategies.volume_spike_signal(ind["ema12_ta"], ind["ema20_ta"], ind["vol_ratio"],
+                                                VOLUME_SPIKE_RATIO)
+    trades = ema_strategies.stop_reverse_trades(df["close"], signal, STOP_LOSS_PCT)
+    pnl = (trades["exit_price"] / trades["entry_price"] - 1) * trades["side"] * (CAPITAL * POSITION_PCT)
+    return pd.Series(np.bincount(trades["exit_idx"], weights=pnl, minlength=len(df)), index=df.index), len(pnl)
+
+
+def run_ict(df, ind, variant="test6_vol_filter"):
+    trades = ict_strategy.run_variant(ind["ict"], ict_strategy.VARIANTS[variant])
+    # rescale each trade from its lot size to POSITION_PCT of CAPITAL
+    _, inverse = np.unique(trades["trade_id"], return_inverse=True)
+    notional = np.bincount(inverse, weights=trades["size"])[inverse] * trades["entry_price"]
+    pnl = trades["pnl"] * (CAPITAL * POSITION_PCT) / notional
+    return pd.Series(np.bincount(trades["exit_idx"], weights=pnl, minlength=len(df)), index=df.index), len(trades)
+
+
+STRATEGIES = {
+    "ema_crossover": {"needs": ["ema12", "ema20"], "columns": ["close"], "run": run_ema_crossover},
+    "ema_volume": {"needs": ["ema12_ta", "ema20_ta", "vol_ratio"], "columns": ["close", "volume"],
+                   "run": run_ema_volume},
+    "ict": {"needs": ["ict"], "columns": ["open", "high", "low", "close"], "run": run_ict},
+}
+
+
+# ================= RUNNER =================
+def stats(pnl, trades):
+    equity = CAPITAL + pnl.cumsum()
+    drawdown = equity / equity.cummax() - 1
+    return {
+        "Trades": trades,
+        "Net PnL": pnl.sum(),
+        "Return %": pnl.sum() / CAPITAL * 100,
+        "Max Drawdown %": drawdown.min() * 100,
+    }
+
+
+def run_ensemble(df, strategies=None, weights=None):
+    """Run every strategy on df with one shared indicator pass.
+
+    Strategies whose input columns are missing from df are skipped.
+    weights: capital share per strategy for the combined book (default
+    equal); every strategy's PnL is sized on the full CAPITAL first.
+    Returns (table, pnl) - table has one column per strategy plus
+    "combined", pnl the per-bar PnL of each.
+    """
+    strategies = STRATEGIES if strategies is None else strategies
+    runnable = {name: s for name, s in strategies.items() if all(c in df for c in s["columns"])}
+    for name in strategies.keys() - runnable.keys():
+        print(f"Skipping {name}: dataset lacks {[c for c in strategies[name]['columns'] if c not in df]}")
+
+    ind = compute_indicators(df, [n for s in runnable.values() for n in s["needs"]])
+    pnl, table = {}, {}
+    for name, strategy in runnable.items():
+        pnl[name], trades = strategy["run"](df, ind)
+        table[name] = stats(pnl[name], trades)
+
+    weights = weights or {name: 1 / len(runnable) for name in runnable}
+    pnl = pd.DataFrame(pnl)
+    pnl["combined"] = sum(pnl[name] * weights[name] for name in runnable)
+    table["combined"] = stats(pnl["combined"], sum(table[name]["Trades"] for name in runnable))
+    return pd.DataFrame(table), pnl
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    df = ict_strategy.load_data()
+    print(f"Dataset: {df.index.min()} → {df.index.max()} ({len(df)} candles)")
+
+    table, pnl = run_ensemble(df)
+    print("\n===== STRATEGY BOOK =====")
+    print(table.round(2).to_string())
+    print("\nDaily PnL correlation:")
+    print(pnl.resample("1D").sum().corr().round(2).to_string())
+
+    (CAPITAL + pnl.cumsum()).plot(figsize=(12, 6), title="Strategy Book – Equity Curves", grid=True)
+    plt.show()
@@ -0,0 +1,113 @@
+# Bar-by-bar mark-to-market equity and exposure
+#
+# test4.py / test6.py take equity as np.cumsum of trade PnLs, so a
+# drawdown only shows up once a trade closes and time between trades is
+# lost. Here every bar gets realized PnL so far plus the open legs marked
+# at that bar's close. Open positions are built with difference arrays
+# (+ at entry, - at exit, cumulative sum), so there is no loop over bars
+# or trades:
+#
+#   curve = equity.mark_to_market(trades, ind["close"], ind["high"], ind["low"])
+
+import numpy as np
+import pandas as pd
+
+
+def _open_sum(entry_idx, exit_idx, weights, n):
+    """Per bar, the sum of weights over legs open at its close (entry_idx <= bar < exit_idx)."""
+    delta = np.bincount(entry_idx, weights=weights, minlength=n + 1)
+    delta -= np.bincount(exit_idx, weights=weights, minlength=n + 1)
+    return np.cumsum(delta[:n])
+
+
+def mark_to_market(trades, close, high=None, low=None, start_capital=0.0):
+    """Per-bar equity curve of an engine.TRADE_DTYPE array.
+
+    trades: one row per exit leg, indices into the bar arrays; pnl may
+    already be net of costs (costs.apply_costs). Legs are marked from their
+    entry price; a leg's pnl is realized on its exit bar.
+    high / low: if given, "trough" is the equity with every held leg marked
+    at the bar's adverse extreme (low for longs, high for shorts) - the
+    intrabar low point a close-only curve misses. Entries fill at the entry
+    bar's close, so a leg is held over entry_idx < bar <= exit_idx; on its
+    exit bar the extreme is capped at the stop / exit price it left at.
+
+    Returns a dict of per-bar arrays: equity, realized, unrealized, units
+    (net signed size), gross_units, exposure (net notional), gross_exposure,
+    drawdown (equity below its running peak) and, with high / low, trough
+    and trough_drawdown.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    entry_idx = trades["entry_idx"].astype(np.int64)
+    exit_idx = trades["exit_idx"].astype(np.int64)
+    signed = trades["side"] * np.abs(trades["size"])
+
+    realized = np.cumsum(np.bincount(exit_idx, weights=trades["pnl"], minlength=n)[:n])
+    units = _open_sum(entry_idx, exit_idx, signed, n)
+    long_units = _open_sum(entry_idx, exit_idx, np.maximum(signed, 0), n)
+    short_units = units - long_units
+    cost_basis = _open_sum(entry_idx, exit_idx, signed * trades["entry_price"], n)
+
+    unrealized = units * close - cost_basis
+    equity = start_capital + realized + unrealized
+    out = {
+        "equity": equity,
+        "realized": realized,
+        "unrealized": unrealized,
+        "units": units,
+        "gross_units": long_units - short_units,
+        "exposure": units * close,
+        "gross_exposure": (long_units - short_units) * close,
+        "drawdown": equity - np.maximum.accumulate(equity),
+    }
+    if high is not None and low is not None:
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        held_from = np.minimum(entry_idx + 1, exit_idx)
+        held_long = _open_sum(held_from, exit_idx, np.maximum(signed, 0), n)
+        held_short = _open_sum(held_from, exit_idx, np.minimum(signed, 0), n)
+        adverse = held_long * (low - close) + held_short * (high - close)
+        # exit bar: the pnl is realized at exit_price, so add the move from it to the capped extreme
+        long = signed > 0
+        worst = np.where(long,
+                         np.maximum(low[exit_idx], np.minimum(trades["stop"], trades["exit_price"])),
+                         np.minimum(high[exit_idx], np.maximum(trades["stop"], trades["exit_price"])))
+        at_exit = np.where(exit_idx > entry_idx, (worst - trades["exit_price"]) * signed, 0.0)
+        adverse += np.bincount(exit_idx, weights=at_exit, minlength=n)[:n]
+        trough = equity + adverse
+        out["trough"] = trough
+        # worst point of the bar against the best close so far
+        out["trough_drawdown"] = trough - np.maximum.accumulate(equity)
+    return out
+
+
+def equity_frame(trades, ind, start_capital=0.0):
+    """mark_to_market on an ict_strategy indicator dict, as a DataFrame indexed by bar time."""
+    curve = mark_to_market(trades, ind["close"], ind["high"], ind["low"], start_capital)
+    return pd.DataFrame(curve, index=pd.DatetimeIndex(ind["time"]))
+
+
+if __name__ == "__main__":
+    import ict_strategy
+    from engine import EXIT_TP, TRADE_DTYPE
+
+    # one long filled at bar 1's close: no adverse move on bar 1, the dip to
+    # 97 on bar 2 counts, the exit bar's dip to 99 before the 104 target counts
+    one = np.zeros(1, dtype=TRADE_DTYPE)
+    one[0] = (0, 1, 1, 3, 100.0, 104.0, 95.0, 104.0, 1.0, 4.0, EXIT_TP)
+    check = mark_to_market(one, [100, 100, 98, 104, 104], [101, 101, 101, 104, 104], [99, 90, 97, 99, 104])
+    assert check["trough"][1] == check["equity"][1] == 0.0
+    assert check["trough"][2] == -3.0 and check["trough"][3] == -1.0 and check["trough"][4] == 4.0
+
+    df = ict_strategy.load_data()
+    ind = ict_strategy.compute_indicators(df)
+    trades = ict_strategy.run_variant(ind, ict_strategy.VARIANTS["test6_vol_filter"])
+
+    curve = equity_frame(trades, ind)
+    by_trade = np.cumsum(trades["pnl"])
+    print(f"Bars: {len(curve)}  Trades: {len(trades)}  Net PnL: {curve['equity'].iloc[-1]:.4f}")
+    print(f"Max DD by trade:       {(by_trade - np.maximum.accumulate(by_trade)).min():.4f}")
+    print(f"Max DD mark-to-market: {curve['drawdown'].min():.4f}")
+    print(f"Max DD intrabar:       {curve['trough_drawdown'].min():.4f}")
+    print(f"Time in market: {(curve['units'] != 0).mean() * 100:.2f}%")
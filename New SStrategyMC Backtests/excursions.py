@@ -0,0 +1,103 @@
+# Trade excursion analytics (MAE / MFE)
+#
+# Works on whole trade arrays at once: every bar a trade was open is
+# gathered into one flat array and reduced per trade with reduceat.
+
+import numpy as np
+import pandas as pd
+
+EXCURSION_DTYPE = np.dtype([
+    ("mae", "f8"),            # max adverse excursion (price units, >= 0)
+    ("mfe", "f8"),            # max favorable excursion (price units, >= 0)
+    ("bars_to_mfe", "i8"),    # bars from entry to the first bar reaching the MFE
+    ("bars_in_trade", "i8"),
+])
+
+
+def excursions(high, low, entry_idx, exit_idx, side, entry_price, include_entry_bar=False):
+    """MAE, MFE, time-to-MFE and bars-in-trade for every trade.
+
+    The window runs from the bar after entry (engine entries fill at the
+    signal bar close) through the exit bar. Pass include_entry_bar=True for
+    fills that happen inside the entry bar, e.g. broker trade logs.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    exit_idx = np.asarray(exit_idx, dtype=np.int64)
+    side = np.asarray(side, dtype=np.int64)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+
+    out = np.zeros(len(entry_idx), dtype=EXCURSION_DTYPE)
+    start = entry_idx if include_entry_bar else entry_idx + 1
+    lengths = np.maximum(exit_idx - start + 1, 0)
+    out["bars_in_trade"] = np.maximum(exit_idx - entry_idx, 0)
+
+    has_bars = lengths > 0
+    if not has_bars.any():
+        return out
+
+    # ===== flat gather of every in-trade bar =====
+    seg_len = lengths[has_bars]
+    seg_start = start[has_bars]
+    offsets = np.concatenate([[0], np.cumsum(seg_len)[:-1]])
+    local = np.arange(seg_len.sum()) - np.repeat(offsets, seg_len)
+    idx = np.repeat(seg_start, seg_len) + local
+
+    is_long = np.repeat(side[has_bars] > 0, seg_len)
+    price = np.repeat(entry_price[has_bars], seg_len)
+    fav = np.where(is_long, high[idx] - price, price - low[idx])
+    adv = np.where(is_long, price - low[idx], high[idx] - price)
+
+    mfe = np.maximum.reduceat(fav, offsets)
+    mae = np.maximum.reduceat(adv, offsets)
+
+    # first bar of each segment that reaches its MFE
+    at_max = fav == np.repeat(mfe, seg_len)
+    first = np.minimum.reduceat(np.where(at_max, local, np.iinfo(np.int64).max), offsets)
+    bars_to_mfe = seg_start + first - entry_idx[has_bars]
+
+    out["mfe"][has_bars] = np.maximum(mfe, 0)
+    out["mae"][has_bars] = np.maximum(mae, 0)
+    out["bars_to_mfe"][has_bars] = np.where(mfe > 0, bars_to_mfe, 0)
+    return out
+
+
+def trade_excursions(trades, high, low):
+    """Excursions per position of an engine trade array (legs collapsed)."""
+    _, first, counts = np.unique(trades["trade_id"], return_index=True, return_counts=True)
+    last = first + counts - 1
+    return excursions(
+        high, low, trades["entry_idx"][first], trades["exit_idx"][last],
+        trades["side"][first], trades["entry_price"][first],
+    )
+
+
+def broker_log_excursions(log, bar_times, high, low):
+    """Excursions for an imported broker trade log (e.g. Charles/maintrades.csv).
+
+    Needs opening_time_utc, closing_time_utc, type (buy/sell) and
+    opening_price columns; bar_times are the bar open times of the OHLC
+    arrays. Returns the log with mae / mfe / bars_to_mfe / bars_in_trade
+    columns added.
+    """
+    bar_times = np.asarray(pd.to_datetime(bar_times)).astype("datetime64[ns]")
+    opened = np.asarray(pd.to_datetime(log["opening_time_utc"])).astype("datetime64[ns]")
+    closed = np.asarray(pd.to_datetime(log["closing_time_utc"])).astype("datetime64[ns]")
+
+    entry_idx = np.searchsorted(bar_times, opened, side="right") - 1
+    exit_idx = np.searchsorted(bar_times, closed, side="right") - 1
+    side = np.where(log["type"].str.lower().to_numpy() == "buy", 1, -1)
+
+    inside = (opened >= bar_times[0]) & (closed <= bar_times[-1])
+    res = np.zeros(len(log), dtype=EXCURSION_DTYPE)
+    res[inside] = excursions(
+        high, low, entry_idx[inside], exit_idx[inside], side[inside],
+        log["opening_price"].to_numpy(dtype=np.float64)[inside], include_entry_bar=True,
+    )
+
+    out = log.copy()
+    for name in EXCURSION_DTYPE.names:
+        out[name] = res[name]
+        out.loc[~inside, name] = np.nan
+    return out
@@ -0,0 +1,223 @@
+# Exit-policy what-if engine
+#
+# Entries stay fixed; ATR_SL_MULT / TP1_R / TP2_R / PARTIAL_SIZE vary. Each
+# entry's forward high/low path is extracted once and every policy is
+# scored against it in one batched pass.
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# ================= CONFIG =================
+LOT_SIZE = 0.05
+HORIZON = 576           # bars looked ahead per entry (2 days of 5m)
+PAIRS_PER_CHUNK = 1_000_000       # (entry, policy) pairs scored per chunk
+TABLE_CELLS_PER_CHUNK = 8_000_000  # entries x horizon x sparse-table levels per chunk
+
+POLICY_FIELDS = ["atr_sl_mult", "tp1_r", "tp2_r", "partial_size"]
+
+
+def policy_grid(atr_sl_mult=(1.5,), tp1_r=(1.0,), tp2_r=(2.0,), partial_size=(0.33,)):
+    """Cartesian product of exit parameters, one row per policy.
+
+    partial_size == 0 means a single target at tp2_r (the test1-3 style exit).
+    """
+    rows = list(itertools.product(atr_sl_mult, tp1_r, tp2_r, partial_size))
+    return pd.DataFrame(rows, columns=POLICY_FIELDS)
+
+
+def entries_from_trades(trades):
+    """(entry_idx, side) of each position in an engine trade array."""
+    _, first = np.unique(trades["trade_id"], return_index=True)
+    return trades["entry_idx"][first], trades["side"][first].astype(np.int64)
+
+
+# ================= PATHS =================
+def extract_paths(high, low, close, entry_idx, side, horizon=HORIZON):
+    """Forward paths after each entry, mirrored so every trade reads as a long.
+
+    Shorts are negated (exact in floating point), so one set of "long" rules
+    scores both sides bit-for-bit like the engine:
+        fav = favorable extreme (high, or -low for shorts)
+        adv = -(adverse extreme), i.e. the stop is touched when adv >= -stop
+    Bars past the end of the data are padded so they never touch a level.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    sign = np.asarray(side, dtype=np.float64)[:, None]
+    n = len(close)
+
+    idx = entry_idx[:, None] + 1 + np.arange(horizon)[None, :]
+    valid = idx < n
+    idx = np.minimum(idx, n - 1)
+
+    long_side = sign > 0
+    fav = np.where(long_side, high[idx], -low[idx])
+    adv = np.where(long_side, -low[idx], high[idx])
+    mark = sign * close[idx]
+
+    fav[~valid] = -np.inf
+    adv[~valid] = -np.inf
+    last = np.maximum(valid.sum(axis=1) - 1, 0)
+    mark = np.where(valid, mark, mark[np.arange(len(entry_idx)), last][:, None])
+
+    return {
+        "entry": sign[:, 0] * close[entry_idx],
+        "fav": fav,
+        "adv": adv,
+        "mark": mark,
+        "last": last,
+    }
+
+
+def _max_table(x):
+    """Sparse table: row l holds max(x[:, j : j + 2**l]), padded with -inf."""
+    h = x.shape[1]
+    tables = [x]
+    span = 1
+    while 2 * span <= h:
+        prev = tables[-1]
+        nxt = np.full_like(prev, -np.inf)
+        nxt[:, :h - span] = np.maximum(prev[:, :h - span], prev[:, span:])
+        tables.append(nxt)
+        span *= 2
+    return np.stack(tables)
+
+
+def _first_at_or_above(table, rows, start, level):
+    """First j >= start with x[row, j] >= level, or H if none (binary lifting)."""
+    h = table.shape[2]
+    pos = start.copy()
+    for lv in range(table.shape[0] - 1, -1, -1):
+        step = 1 << lv
+        can = pos + step <= h
+        peek = table[lv, rows, np.minimum(pos, h - 1)]
+        pos += step * (can & (peek < level))
+    hit = (pos < h) & (table[0, rows, np.minimum(pos, h - 1)] >= level)
+    return np.where(hit, pos, h)
+
+
+# ================= EVALUATION =================
+def _evaluate_chunk(paths, sl_dist, policies, rows_sel, lot_size):
+    fav_t = _max_table(paths["fav"][rows_sel])
+    adv_t = _max_table(paths["adv"][rows_sel])
+    h = fav_t.shape[2]
+    e, p = len(rows_sel), len(policies)
+
+    rows = np.repeat(np.arange(e), p)
+    entry = np.repeat(paths["entry"][rows_sel], p)
+    dist = np.repeat(sl_dist[rows_sel], p) * np.tile(policies["atr_sl_mult"].to_numpy(), e)
+    tp1_r = np.tile(policies["tp1_r"].to_numpy(), e)
+    tp2_r = np.tile(policies["tp2_r"].to_numpy(), e)
+    part = np.tile(policies["partial_size"].to_numpy(), e)
+    partial = part > 0
+
+    sl = entry - dist
+    tp1 = entry + (entry - sl) * tp1_r
+    tp2 = entry + (entry - sl) * tp2_r
+    zero = np.zeros(len(rows), dtype=np.int64)
+
+    # ===== phase 1: full size, original stop =====
+    t_sl = _first_at_or_above(adv_t, rows, zero, -sl)
+    t_tp2 = _first_at_or_above(fav_t, rows, zero, tp2)
+    t_tp1 = np.where(partial, _first_at_or_above(fav_t, rows, zero, tp1), h)
+    t_tgt = np.minimum(t_tp1, t_tp2)
+    t1 = np.minimum(t_sl, t_tgt)
+
+    resolved = t1 < h
+    stop_hit = resolved & (t_sl <= t_tgt)
+    fav_t1 = fav_t[0, rows, np.minimum(t1, h - 1)]
+    tp1_hit = resolved & ~stop_hit & partial & (fav_t1 >= tp1)
+    tp2_hit = resolved & ~stop_hit & ~tp1_hit
+
+    pnl = np.zeros(len(rows))
+    pnl[stop_hit] = (sl[stop_hit] - entry[stop_hit]) * lot_size
+    pnl[tp2_hit] = (tp2[tp2_hit] - entry[tp2_hit]) * lot_size
+    exit_bar = t1.copy()
+    timeout = ~resolved
+
+    # ===== phase 2: after TP1, remaining size with stop at breakeven =====
+    if tp1_hit.any():
+        k = np.flatnonzero(tp1_hit)
+        pnl[k] = (tp1[k] - entry[k]) * (lot_size * part[k])
+        remaining = lot_size * (1 - part[k])
+        start = t1[k] + 1
+        t_be = _first_at_or_above(adv_t, rows[k], start, -entry[k])
+        t_fin = _first_at_or_above(fav_t, rows[k], start, tp2[k])
+        t2 = np.minimum(t_be, t_fin)
+        win = (t2 < h) & (t_fin < t_be)
+        pnl[k[win]] += (tp2[k[win]] - entry[k[win]]) * remaining[win]
+        exit_bar[k] = t2
+        open_k = k[t2 >= h]
+        timeout[open_k] = True
+        mark_k = paths["mark"][rows_sel][rows[open_k], paths["last"][rows_sel][rows[open_k]]]
+        pnl[open_k] += (mark_k - entry[open_k]) * lot_size * (1 - part[open_k])
+
+    # ===== positions still open at the horizon are marked to the last close =====
+    first_open = np.flatnonzero(~resolved)
+    if len(first_open):
+        mark_k = paths["mark"][rows_sel][rows[first_open], paths["last"][rows_sel][rows[first_open]]]
+        pnl[first_open] = (mark_k - entry[first_open]) * lot_size
+
+    exit_bar = np.where(timeout, paths["last"][rows_sel][rows], exit_bar)
+    return pnl.reshape(e, p), (exit_bar + 1).reshape(e, p), timeout.reshape(e, p)
+
+
+def evaluate(paths, atr_at_entry, policies, lot_size=LOT_SIZE):
+    """Per-entry PnL of every policy.
+
+    Each entry is scored on its own: no overlap between positions and no
+    daily limits (those depend on the exit policy). Same-bar SL/TP
+    ambiguity resolves to the stop, as in the engine.
+
+    Returns (pnl, bars_held, timeout) arrays of shape (entries, policies).
+    """
+    sl_dist = np.asarray(atr_at_entry, dtype=np.float64)
+    e = len(sl_dist)
+    p = len(policies)
+    pnl = np.zeros((e, p))
+    held = np.zeros((e, p), dtype=np.int64)
+    timeout = np.zeros((e, p), dtype=bool)
+
+    # bound both the per-pair arrays and the entries' sparse tables
+    horizon = paths["fav"].shape[1]
+    levels = max(horizon, 1).bit_length()
+    step = max(1, min(PAIRS_PER_CHUNK // max(p, 1), TABLE_CELLS_PER_CHUNK // (max(horizon, 1) * levels)))
+    for lo in range(0, e, step):
+        rows_sel = np.arange(lo, min(lo + step, e))
+        pnl[rows_sel], held[rows_sel], timeout[rows_sel] = _evaluate_chunk(
+            paths, sl_dist, policies, rows_sel, lot_size)
+    return pnl, held, timeout
+
+
+def policy_metrics(pnl, held, timeout):
+    """Metrics per policy (columns of the entries x policies matrices)."""
+    equity = np.cumsum(pnl, axis=0)
+    gains = np.where(pnl > 0, pnl, 0).sum(axis=0)
+    losses = -np.where(pnl < 0, pnl, 0).sum(axis=0)
+    n = pnl.shape[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "trades": n,
+            "net_pnl": pnl.sum(axis=0),
+            "win_rate": (pnl > 0).mean(axis=0) * 100 if n else 0.0,
+            "avg_pnl": pnl.mean(axis=0) if n else 0.0,
+            "profit_factor": np.where(losses > 0, gains / losses, np.inf),
+            "max_drawdown": metrics.max_drawdown(equity.T, relative=False)[0] if n else 0.0,
+            "avg_bars_held": held.mean(axis=0) if n else 0.0,
+            "timeouts": timeout.sum(axis=0),
+        })
+
+
+def policy_table(high, low, close, atr, entry_idx, side, policies,
+                 horizon=HORIZON, lot_size=LOT_SIZE):
+    """policy x metrics table for a fixed set of entries."""
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    paths = extract_paths(high, low, close, entry_idx, side, horizon)
+    pnl, held, timeout = evaluate(paths, np.asarray(atr)[entry_idx], policies, lot_size)
+    return pd.concat([policies.reset_index(drop=True), policy_metrics(pnl, held, timeout)], axis=1)
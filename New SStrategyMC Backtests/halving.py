@@ -0,0 +1,134 @@
+# Successive-halving parameter search
+#
+# Every candidate is scored on a short trailing slice of history; only the
+# best 1/eta move on to a slice eta times longer, until the survivors are
+# scored on the full history. Pruned candidates are never evaluated again,
+# so most of the budget goes to the parameter sets that still look good.
+#
+# Each evaluation is appended to a JSONL log as it finishes; re-running with
+# the same log skips everything already scored and resumes the search.
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import ict_strategy
+import sweep
+
+# ================= CONFIG =================
+MIN_DAYS = 14
+ETA = 3
+WARMUP_BARS = 500       # extra bars before each slice so indicators are warmed up
+OBJECTIVE = "Net PnL"
+
+
+# ================= RUNGS =================
+def rung_days(total_days, min_days=MIN_DAYS, eta=ETA):
+    """Slice length of each rung: min_days * eta**k, the last one the full history."""
+    days = []
+    d = min_days
+    while d < total_days:
+        days.append(d)
+        d *= eta
+    days.append(total_days)
+    return days
+
+
+def param_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def load_log(log_file):
+    """{(rung, key): row} of evaluations already logged."""
+    done = {}
+    if log_file and os.path.exists(log_file):
+        with open(log_file) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    done[(row["rung"], row["key"])] = row
+    return done
+
+
+# ================= WORKER =================
+def _rung_task(ind_params, trade_params, base_variant, start, objective):
+    """Score trade variants of one indicator param set on the bars from start on."""
+    df = sweep._SHARED["df"]
+    lo = max(start - WARMUP_BARS, 0)
+    ind = ict_strategy.compute_indicators(df.iloc[lo:], ind_params)
+    rows = []
+    for extra in trade_params:
+        variant = dict(base_variant)
+        variant.update(extra)
+        stats = ict_strategy.summarize(ict_strategy.run_variant(ind, variant, start - lo))
+        rows.append({"params": {**ind_params, **extra}, "score": float(stats[objective]),
+                     "trades": int(stats["Total Trades"])})
+    return rows
+
+
+# ================= SEARCH =================
+def halving_search(df, candidates, base_variant=None, min_days=MIN_DAYS, eta=ETA,
+                   objective=OBJECTIVE, workers=None, log_file=None):
+    """Successive halving over candidate param dicts (e.g. sweep.param_grid(...)).
+
+    Returns a DataFrame of every evaluation (one row per candidate per rung
+    it reached), the survivors of the last rung sorted best first.
+    """
+    base_variant = ict_strategy.VARIANTS["test6_vol_filter"] if base_variant is None else base_variant
+    workers = workers or os.cpu_count()
+    times = df.index
+    total_days = (times[-1] - times[0]) / pd.Timedelta(days=1)
+    done = load_log(log_file)
+
+    alive = list(candidates)
+    history = []
+    blocks, spec = sweep.publish(df)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=sweep._init_worker, initargs=(spec,)) as pool:
+            for rung, days in enumerate(rung_days(total_days, min_days, eta)):
+                start = int(np.searchsorted(times, times[-1] - pd.Timedelta(days=days)))
+                scores = {param_key(p): done[(rung, param_key(p))]["score"]
+                          for p in alive if (rung, param_key(p)) in done}
+                todo = [p for p in alive if param_key(p) not in scores]
+
+                futures = [pool.submit(_rung_task, ind, trade, base_variant, start, objective)
+                           for ind, trade in sweep.group_tasks(todo)]
+                for fut in as_completed(futures):
+                    for row in fut.result():
+                        key = param_key(row["params"])
+                        scores[key] = row["score"]
+                        if log_file:
+                            with open(log_file, "a") as f:
+                                f.write(json.dumps({"rung": rung, "days": days, "key": key, **row},
+                                                   default=str) + "\n")
+
+                ranked = sorted(alive, key=lambda p: scores[param_key(p)], reverse=True)
+                for p in ranked:
+                    history.append({"rung": rung, "days": days, **p, "score": scores[param_key(p)]})
+                alive = ranked[:max(1, math.ceil(len(ranked) / eta))]
+    finally:
+        sweep.release(blocks)
+
+    return pd.DataFrame(history)
+
+
+if __name__ == "__main__":
+    df = ict_strategy.load_data(days=730)
+    candidates = sweep.param_grid(
+        htf_lookback=[24, 36, 48, 72, 96],
+        liq_lookback=[10, 20, 40],
+        swing_lookback=[3, 5, 8],
+        event_state_bars=[3, 5, 8],
+        atr_sl_mult=[1.0, 1.5, 2.0],
+        tp2_r=[1.5, 2.0, 3.0],
+    )
+    print(f"Successive halving over {len(candidates)} candidates, rungs (days):",
+          rung_days((df.index[-1] - df.index[0]).days))
+    history = halving_search(df, candidates, log_file="halving_log.jsonl")
+    print(history.groupby("rung").size().rename("evaluated").to_string())
+    last = history[history["rung"] == history["rung"].max()]
+    print(last.head(10).to_string())
@@ -0,0 +1,196 @@
+# Configurable ICT strategy
+#
+# One load and one indicator pass shared by every variant; test1.py -
+# test6.py become feature toggles evaluated side by side.
+
+import pandas as pd
+import numpy as np
+from datetime import timedelta, time
+
+import bitset
+import engine
+import metrics
+
+# ================= CONFIG =================
+CSV_FILE = "btcusd.csv"
+BACKTEST_DAYS = 182
+
+PARAMS = {
+    "htf_lookback": 48,
+    "liq_lookback": 20,
+    "atr_period": 14,
+    "swing_lookback": 5,
+    "bias_state_bars": 20,
+    "event_state_bars": 5,
+    "atr_median_bars": 50,
+    "ny_start": time(13, 0),    # NY Kill Zone (UTC)
+    "ny_end": time(17, 0),
+}
+
+# signal toggles (ny_killzone, vol_filter) + engine.DEFAULT_CONFIG overrides
+VARIANTS = {
+    "test1_state": {"ny_killzone": False, "vol_filter": False, "sl_mode": "range",
+                    "partial_tp": False, "daily_limits": False},
+    "test2_ny": {"ny_killzone": True, "vol_filter": False, "sl_mode": "range",
+                 "partial_tp": False, "daily_limits": False},
+    "test3_atr_sl": {"ny_killzone": True, "vol_filter": False, "sl_mode": "atr",
+                     "partial_tp": False, "daily_limits": False},
+    "test4_partial_be": {"ny_killzone": True, "vol_filter": False, "sl_mode": "atr",
+                         "partial_tp": True, "partial_size": 0.5, "daily_limits": False},
+    "test5_daily_limits": {"ny_killzone": True, "vol_filter": False, "sl_mode": "atr",
+                           "partial_tp": True, "partial_size": 0.5, "daily_limits": True},
+    "test6_vol_filter": {"ny_killzone": True, "vol_filter": True, "sl_mode": "atr",
+                         "partial_tp": True, "partial_size": 0.33, "daily_limits": True},
+}
+
+LONG_CONDITIONS = ["bull_bias", "liq_long", "fvg_long", "bull_mss", "discount"]
+SHORT_CONDITIONS = ["bear_bias", "liq_short", "fvg_short", "bear_mss", "premium"]
+
+
+# ================= LOAD DATA =================
+def load_data(csv_file=CSV_FILE, days=BACKTEST_DAYS):
+    df = pd.read_csv(csv_file)
+    df["open_time"] = pd.to_datetime(df["open_time"])
+    df.set_index("open_time", inplace=True)
+    df.sort_index(inplace=True)
+
+    end_date = df.index.max()
+    start_date = end_date - timedelta(days=days)
+    return df.loc[start_date:end_date]
+
+
+# ================= INDICATORS =================
+def compute_indicators(df, params=None):
+    """Every column any variant needs, as NumPy arrays keyed by name.
+
+    Same formulas as the scripts (including their NaN warm-up behaviour),
+    plus a "packed" dict of bitset-packed boolean conditions.
+    """
+    p = dict(PARAMS)
+    if params:
+        p.update(params)
+
+    high, low, close, open_ = df["high"], df["low"], df["close"], df["open"]
+    state = p["event_state_bars"]
+
+    ind = {
+        "time": df.index.to_numpy(),
+        "open": open_.to_numpy(dtype=np.float64),
+        "high": high.to_numpy(dtype=np.float64),
+        "low": low.to_numpy(dtype=np.float64),
+        "close": close.to_numpy(dtype=np.float64),
+    }
+
+    ind["in_ny"] = (df.index.time >= p["ny_start"]) & (df.index.time <= p["ny_end"])
+
+    range_high = high.rolling(p["htf_lookback"]).max()
+    range_low = low.rolling(p["htf_lookback"]).min()
+    equilibrium = (range_high + range_low) / 2
+    ind["range_high"] = range_high.to_numpy()
+    ind["range_low"] = range_low.to_numpy()
+
+    ind["bull_bias"] = (close > equilibrium).rolling(p["bias_state_bars"]).max().astype(bool).to_numpy()
+    ind["bear_bias"] = (close < equilibrium).rolling(p["bias_state_bars"]).max().astype(bool).to_numpy()
+
+    liq_low = low <= low.rolling(p["liq_lookback"]).min() * 1.0002
+    liq_high = high >= high.rolling(p["liq_lookback"]).max() * 0.9998
+    ind["liq_long"] = liq_low.rolling(state).max().astype(bool).to_numpy()
+    ind["liq_short"] = liq_high.rolling(state).max().astype(bool).to_numpy()
+
+    atr = (high - low).rolling(p["atr_period"]).mean()
+    ind["atr"] = atr.to_numpy()
+    ind["vol_ok"] = (atr > atr.rolling(p["atr_median_bars"]).median()).to_numpy()
+
+    bull_disp = (close > open_) & ((close - open_) > atr)
+    bear_disp = (open_ > close) & ((open_ - close) > atr)
+    bull_fvg = low > high.shift(2)
+    bear_fvg = high < low.shift(2)
+    ind["fvg_long"] = (bull_disp & bull_fvg).rolling(state).max().astype(bool).to_numpy()
+    ind["fvg_short"] = (bear_disp & bear_fvg).rolling(state).max().astype(bool).to_numpy()
+
+    swing_high = high.rolling(p["swing_lookback"]).max()
+    swing_low = low.rolling(p["swing_lookback"]).min()
+    ind["bull_mss"] = (close > swing_high.shift(1)).rolling(state).max().astype(bool).to_numpy()
+    ind["bear_mss"] = (close < swing_low.shift(1)).rolling(state).max().astype(bool).to_numpy()
+
+    ind["discount"] = (close < equilibrium).to_numpy()
+    ind["premium"] = (close > equilibrium).to_numpy()
+
+    names = LONG_CONDITIONS + SHORT_CONDITIONS + ["in_ny", "vol_ok"]
+    ind["packed"] = {name: bitset.pack(ind[name]) for name in names}
+    return ind
+
+
+# ================= SIGNALS =================
+def signal_conditions(variant):
+    extra = []
+    if variant.get("ny_killzone", True):
+        extra.append("in_ny")
+    if variant.get("vol_filter", False):
+        extra.append("vol_ok")
+    return extra + LONG_CONDITIONS, extra + SHORT_CONDITIONS
+
+
+def entry_signals(ind, variant):
+    """Long / short entry masks for a variant, combined as packed bitsets."""
+    n = len(ind["close"])
+    long_conds, short_conds = signal_conditions(variant)
+    packed = ind["packed"]
+    long_signal = bitset.unpack(bitset.and_all(packed[c] for c in long_conds), n)
+    short_signal = bitset.unpack(bitset.and_all(packed[c] for c in short_conds), n)
+    return long_signal, short_signal
+
+
+def run_variant(ind, variant, start=0, end=None):
+    """Trades of one variant, optionally on the bar window [start, end).
+
+    Indicators come from the full history, so a window sees warmed-up
+    values; it starts flat. Trade indices are relative to the full arrays.
+    """
+    long_signal, short_signal = entry_signals(ind, variant)
+    w = slice(start, end)
+    trades = engine.run_backtest(
+        ind["high"][w], ind["low"][w], ind["close"][w], ind["atr"][w],
+        long_signal[w], short_signal[w], ind["time"][w], engine.make_config(variant),
+        range_low=ind["range_low"][w], range_high=ind["range_high"][w],
+    )
+    trades["entry_idx"] += start
+    trades["exit_idx"] += start
+    return trades
+
+
+# ================= RESULTS =================
+def summarize(trades):
+    """The stats the test scripts print, from a trade array."""
+    pnl = trades["pnl"]
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    equity = np.cumsum(pnl)
+    max_dd = metrics.max_drawdown(equity, relative=False)[0] if len(pnl) else 0.0
+    return {
+        "Total Trades": len(pnl),
+        "Win Rate %": len(wins) / len(pnl) * 100 if len(pnl) else 0.0,
+        "Net PnL": pnl.sum(),
+        "Avg Win": wins.mean() if len(wins) else 0.0,
+        "Avg Loss": losses.mean() if len(losses) else 0.0,
+        "Worst Trade": pnl.min() if len(pnl) else 0.0,
+        "Max Drawdown": max_dd,
+        "Return / Max DD": equity[-1] / abs(max_dd) if max_dd != 0 else 0.0,
+    }
+
+
+def compare(ind, variants=None):
+    """Side-by-side table: one column per variant, one row per stat."""
+    variants = VARIANTS if variants is None else variants
+    table = {name: summarize(run_variant(ind, variant)) for name, variant in variants.items()}
+    return pd.DataFrame(table)
+
+
+if __name__ == "__main__":
+    df = load_data()
+    print(f"Backtest period: {df.index.min()} → {df.index.max()}")
+    print("Candles:", len(df))
+
+    ind = compute_indicators(df)
+    print("\n===== ICT VARIANT COMPARISON =====")
+    print(compare(ind).round(4).to_string())
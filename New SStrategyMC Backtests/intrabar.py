@@ -0,0 +1,114 @@
+# Lazy intrabar resolution of same-bar SL/TP ambiguity
+#
+# The ICT loops check the stop before the target, so a 5m bar touching both
+# is always scored as a loss. Here only those ambiguous bars are looked up
+# in finer (1m or tick) candles from the candle store - memory-mapped, so
+# nothing else of the fine series is read - to see which level came first.
+
+import numpy as np
+
+import candle_store
+import engine
+
+MAX_PASSES = 10
+
+
+def ambiguous_exits(trades, high, low):
+    """Indices of exit legs whose bar touched both the stop and the active target.
+
+    Covers stop exits (the default scoring) as well as target exits that an
+    earlier resolution pass already flipped.
+    """
+    bar = trades["exit_idx"]
+    long_both = (trades["side"] > 0) & (low[bar] <= trades["stop"]) & (high[bar] >= trades["target"])
+    short_both = (trades["side"] < 0) & (high[bar] >= trades["stop"]) & (low[bar] <= trades["target"])
+    return np.flatnonzero(long_both | short_both)
+
+
+def bar_width(bar_times):
+    times = np.asarray(bar_times).astype("datetime64[ns]").astype(np.int64)
+    return int(np.median(np.diff(times))) if len(times) > 1 else 0
+
+
+def target_first(fine, starts, width, side, stop, target):
+    """For each coarse bar, True if the fine data touches target before stop.
+
+    starts are coarse bar open times; a fine bar that touches both levels
+    (or no fine data at all) keeps the stop-first assumption.
+    """
+    starts = np.asarray(starts).astype("datetime64[ns]").astype(np.int64)
+    lo, hi = candle_store.row_range(fine, starts.astype("datetime64[ns]"),
+                                    (starts + width).astype("datetime64[ns]"))
+    lengths = hi - lo
+    result = np.zeros(len(starts), dtype=bool)
+    has_rows = lengths > 0
+    if not has_rows.any():
+        return result
+
+    seg_len = lengths[has_rows]
+    offsets = np.concatenate([[0], np.cumsum(seg_len)[:-1]])
+    local = np.arange(seg_len.sum()) - np.repeat(offsets, seg_len)
+    rows = np.repeat(lo[has_rows], seg_len) + local
+
+    # gather only the needed fine rows out of the memmaps
+    f_high = np.asarray(fine["high"][rows])
+    f_low = np.asarray(fine["low"][rows])
+    is_long = np.repeat(side[has_rows] > 0, seg_len)
+    s = np.repeat(stop[has_rows], seg_len)
+    t = np.repeat(target[has_rows], seg_len)
+
+    stop_touch = np.where(is_long, f_low <= s, f_high >= s)
+    target_touch = np.where(is_long, f_high >= t, f_low <= t)
+
+    never = np.iinfo(np.int64).max
+    first_stop = np.minimum.reduceat(np.where(stop_touch, local, never), offsets)
+    first_target = np.minimum.reduceat(np.where(target_touch, local, never), offsets)
+    result[has_rows] = first_target < first_stop
+    return result
+
+
+def run_resolved(high, low, close, atr, long_signal, short_signal, timestamps, fine,
+                 config=None, max_passes=MAX_PASSES, **kwargs):
+    """engine.run_backtest with ambiguous bars resolved from fine candles.
+
+    fine is a candle_store.open_series(...) of a finer timeframe. Resolving
+    a bar can change every later trade, so the run is repeated with the
+    updated per-bar decisions until the trade list stops changing.
+
+    Returns (trades, tp_first) where tp_first marks the bars scored
+    target-first. After a target-first TP1 the rest of that bar is not
+    re-examined: the moved stop is only checked from the next bar on.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    timestamps = np.asarray(timestamps).astype("datetime64[ns]")
+    width = bar_width(timestamps)
+    tp_first = np.zeros(len(close), dtype=bool)
+
+    trades = engine.run_backtest(high, low, close, atr, long_signal, short_signal, timestamps,
+                                 config, tp_first=tp_first, **kwargs)
+    decided = {}
+    for _ in range(max_passes):
+        amb = ambiguous_exits(trades, high, low)
+        todo = [k for k in amb if _key(trades[k]) not in decided]
+        if todo:
+            todo = np.asarray(todo)
+            legs = trades[todo]
+            first = target_first(fine, timestamps[legs["exit_idx"]], width,
+                                 legs["side"], legs["stop"], legs["target"])
+            for leg, flag in zip(legs, first):
+                decided[_key(leg)] = bool(flag)
+
+        new_flags = np.zeros(len(close), dtype=bool)
+        for k in amb:
+            new_flags[trades["exit_idx"][k]] = decided[_key(trades[k])]
+        if np.array_equal(new_flags, tp_first):
+            break
+        tp_first = new_flags
+        trades = engine.run_backtest(high, low, close, atr, long_signal, short_signal, timestamps,
+                                     config, tp_first=tp_first, **kwargs)
+    return trades, tp_first
+
+
+def _key(leg):
+    return int(leg["exit_idx"]), int(leg["side"]), float(leg["stop"]), float(leg["target"])
@@ -0,0 +1,25 @@
+# Optional numba support
+#
+# Kernels are written so they run as plain Python when numba is missing
+# (pip install numba for the compiled path).
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def wrap(fn):
+            return fn
+        return wrap
+
+
+def kernel_args(*arrays):
+    """Python lists index much faster than NumPy scalars in the fallback path."""
+    if HAVE_NUMBA:
+        return arrays
+    return tuple(a.tolist() for a in arrays)
@@ -0,0 +1,290 @@
+# Distributed sweep job queue
+#
+# A single SQLite file holds the jobs and their results. Any number of
+# worker processes - on this box or on other machines that mount the same
+# directory together with the candle store - claim jobs under a lease, keep
+# it alive with a heartbeat and write their rows back into the same file.
+# A worker that dies simply stops heartbeating; its lease runs out and the
+# job is handed to someone else.
+#
+# Job IDs are a hash of the job payload, so submitting the same sweep twice
+# (or after a crash) never duplicates work.
+#
+# Note: SQLite locking on network filesystems is only as good as the
+# filesystem's fcntl locks - fine on a local disk or a well-behaved NFS.
+#
+#   python job_queue.py submit     # enqueue the sweep in __main__
+#   python job_queue.py worker     # run one worker (start as many as you like)
+#   python job_queue.py status
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import candle_store
+import ict_strategy
+import sweep
+
+# ================= CONFIG =================
+DB_FILE = "sweep_jobs.db"
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 15
+MAX_ATTEMPTS = 3
+IDLE_POLL_SECONDS = 2
+WARMUP_BARS = 500       # bars loaded before each window so indicators are warmed up
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending | running | done | failed
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    worker TEXT,
+    finished REAL,
+    rows TEXT NOT NULL
+);
+"""
+
+
+# ================= DATABASE =================
+def connect(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=60000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def job_id(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ================= PRODUCER =================
+def fold_windows(times, folds, part="train"):
+    """[start, end) timestamps of walk_forward.make_folds windows."""
+    times = pd.DatetimeIndex(times)
+    end_of = lambda hi: times[hi] if hi < len(times) else times[-1] + pd.Timedelta(1, "ns")
+    return [(times[f[part][0]], end_of(f[part][1])) for f in folds]
+
+
+def make_jobs(symbol, timeframe, grid, windows, base_variant=None):
+    """One job per (time window, indicator param set), like sweep.group_tasks.
+
+    windows: list of [start, end) timestamps, e.g. from fold_windows.
+    """
+    base_variant = ict_strategy.VARIANTS["test6_vol_filter"] if base_variant is None else base_variant
+    jobs = []
+    for start, end in windows:
+        for ind_params, trade_params in sweep.group_tasks(grid):
+            jobs.append({
+                "symbol": symbol, "timeframe": timeframe,
+                "start": str(pd.Timestamp(start)), "end": str(pd.Timestamp(end)),
+                "ind_params": ind_params, "trade_params": trade_params,
+                "base_variant": base_variant,
+            })
+    return jobs
+
+
+def submit(conn, jobs):
+    """Enqueue payloads; already known job IDs are ignored. Returns the number added."""
+    now = time.time()
+    rows = [(job_id(p), json.dumps(p, sort_keys=True, default=str), now) for p in jobs]
+    before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO jobs (id, payload, created) VALUES (?, ?, ?)", rows)
+    return conn.total_changes - before
+
+
+# ================= LEASES =================
+def claim(conn, worker, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """Atomically take the oldest pending (or lease-expired) job -> (id, payload) or None."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired') "
+                     "WHERE status = 'running' AND lease_until < ? AND attempts >= ?", (now, max_attempts))
+        row = conn.execute(
+            "SELECT id, payload FROM jobs "
+            "WHERE (status = 'pending' OR (status = 'running' AND lease_until < ?)) AND attempts < ? "
+            "ORDER BY created, id LIMIT 1", (now, max_attempts)).fetchone()
+        if row:
+            conn.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                         "attempts = attempts + 1 WHERE id = ?", (worker, now + lease, row[0]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return (row[0], json.loads(row[1])) if row else None
+
+
+def heartbeat(conn, jid, worker, lease=LEASE_SECONDS):
+    """Extend the lease; False if the job was meanwhile taken over by another worker."""
+    cur = conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                       (time.time() + lease, jid, worker))
+    return cur.rowcount == 1
+
+
+def complete(conn, jid, worker, rows):
+    """Store the result rows and mark the job done (idempotent)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR IGNORE INTO results (job_id, worker, finished, rows) VALUES (?, ?, ?, ?)",
+                     (jid, worker, time.time(), json.dumps(rows, default=str)))
+        conn.execute("UPDATE jobs SET status = 'done', lease_until = NULL, error = NULL WHERE id = ?", (jid,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def fail(conn, jid, worker, error, max_attempts=MAX_ATTEMPTS):
+    """Release the job for a retry, or mark it failed after max_attempts."""
+    conn.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                 "lease_until = NULL, error = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                 (max_attempts, error, jid, worker))
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps one job's lease alive while the worker computes."""
+
+    def __init__(self, db_file, jid, worker, lease, every):
+        super().__init__(daemon=True)
+        self.db_file, self.jid, self.worker = db_file, jid, worker
+        self.lease, self.every = lease, every
+        self.stop = threading.Event()
+
+    def run(self):
+        conn = connect(self.db_file)
+        try:
+            while not self.stop.wait(self.every):
+                if not heartbeat(conn, self.jid, self.worker, self.lease):
+                    return
+        finally:
+            conn.close()
+
+
+# ================= WORKER =================
+_SERIES = {}
+
+
+def _open(store_root, symbol, timeframe):
+    key = (store_root, symbol, timeframe)
+    if key not in _SERIES:
+        _SERIES[key] = candle_store.open_series(store_root, symbol, timeframe)
+    return _SERIES[key]
+
+
+def run_job(payload, store_root=candle_store.STORE_DIR):
+    """Load only this job's window (plus warm-up) from the store and score it."""
+    series = _open(store_root, payload["symbol"], payload["timeframe"])
+    lo, hi = candle_store.row_range(series, np.datetime64(pd.Timestamp(payload["start"])),
+                                    np.datetime64(pd.Timestamp(payload["end"])))
+    lo_w = max(int(lo) - WARMUP_BARS, 0)
+    df = candle_store.load_window(series, series["time"][lo_w].astype("datetime64[ns]"),
+                                  np.datetime64(pd.Timestamp(payload["end"])))
+
+    ind = ict_strategy.compute_indicators(df, payload["ind_params"])
+    rows = []
+    for extra in payload["trade_params"]:
+        variant = dict(payload["base_variant"])
+        variant.update(extra)
+        stats = ict_strategy.summarize(ict_strategy.run_variant(ind, variant, int(lo) - lo_w))
+        rows.append({**payload["ind_params"], **extra, **{k: float(v) for k, v in stats.items()}})
+    return rows
+
+
+def run_worker(db_file=DB_FILE, store_root=candle_store.STORE_DIR, worker=None,
+               lease=LEASE_SECONDS, heartbeat_every=HEARTBEAT_SECONDS, exit_when_idle=True):
+    """Claim and run jobs until the queue is drained (or forever if exit_when_idle is False)."""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect(db_file)
+    done = 0
+    try:
+        while True:
+            job = claim(conn, worker, lease)
+            if job is None:
+                if exit_when_idle and not pending(conn):
+                    return done
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            jid, payload = job
+            beat = _Heartbeat(db_file, jid, worker, lease, heartbeat_every)
+            beat.start()
+            try:
+                rows = run_job(payload, store_root)
+            except Exception as e:
+                beat.stop.set()
+                beat.join()
+                fail(conn, jid, worker, f"{type(e).__name__}: {e}")
+                continue
+            beat.stop.set()
+            beat.join()
+            complete(conn, jid, worker, rows)
+            done += 1
+    finally:
+        conn.close()
+
+
+# ================= RESULTS =================
+def pending(conn):
+    """Jobs not finished yet (pending or running, excluding permanently failed)."""
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+
+
+def status(conn):
+    return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def collect(conn):
+    """All result rows as one DataFrame, tagged with their job's symbol and window."""
+    frames = []
+    for payload, rows in conn.execute(
+            "SELECT j.payload, r.rows FROM results r JOIN jobs j ON j.id = r.job_id ORDER BY j.created, j.id"):
+        payload = json.loads(payload)
+        frame = pd.DataFrame(json.loads(rows))
+        frame.insert(0, "end", payload["end"])
+        frame.insert(0, "start", payload["start"])
+        frame.insert(0, "symbol", payload["symbol"])
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+if __name__ == "__main__":
+    import walk_forward
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    conn = connect()
+
+    if command == "submit":
+        symbol, timeframe = "BTCUSDT", "5m"
+        series = candle_store.open_series(candle_store.STORE_DIR, symbol, timeframe)
+        times = pd.DatetimeIndex(np.asarray(series["time"]).astype("datetime64[ns]"))
+        windows = fold_windows(times, walk_forward.make_folds(times))
+        grid = sweep.param_grid(
+            htf_lookback=[24, 48, 96],
+            liq_lookback=[10, 20, 40],
+            event_state_bars=[3, 5, 8],
+            atr_sl_mult=[1.0, 1.5, 2.0],
+        )
+        print("Added", submit(conn, make_jobs(symbol, timeframe, grid, windows)), "jobs")
+    elif command == "worker":
+        print("Finished", run_worker(), "jobs")
+    elif command == "results":
+        print(collect(conn).to_string())
+    print(status(conn))
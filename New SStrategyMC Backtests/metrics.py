@@ -0,0 +1,187 @@
+# Performance metrics over equity curves and trade PnLs
+#
+# One place for the stats the scripts print ad hoc. Every function works
+# along the last axis, so a 2-D array (one row per sweep result / path)
+# is scored in one call:
+#
+#   table = metrics.summary(curves, periods_per_year=metrics.CRYPTO_5M)
+#
+# Trade stats for many results at once take the concatenated PnLs plus a
+# result id per trade.
+
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+CRYPTO_5M = 365 * 24 * 12     # crypto trades every day of the year
+NSE_5M = 252 * 75             # 09:15 - 15:30 session
+DAILY = 252
+
+
+# ================= RETURNS =================
+def returns(equity):
+    """Simple per-bar returns of equity curves (NaN for the first bar)."""
+    equity = np.asarray(equity, dtype=np.float64)
+    out = np.full(equity.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., 1:] = equity[..., 1:] / equity[..., :-1] - 1
+    return out
+
+
+def sharpe(rets, periods_per_year, risk_free=0.0):
+    """Annualized Sharpe ratio (sample std, NaNs skipped like pandas)."""
+    excess = np.asarray(rets, dtype=np.float64) - risk_free / periods_per_year
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(excess, axis=-1) / np.nanstd(excess, axis=-1, ddof=1) * np.sqrt(periods_per_year)
+
+
+def sortino(rets, periods_per_year, target=0.0):
+    """Annualized Sortino ratio: mean excess return over downside deviation."""
+    excess = np.asarray(rets, dtype=np.float64) - target
+    downside = np.sqrt(np.nanmean(np.minimum(excess, 0) ** 2, axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(excess, axis=-1) / downside * np.sqrt(periods_per_year)
+
+
+def cagr(equity, periods_per_year, start_value=None):
+    """Compound annual growth over the curve's length in bars.
+
+    start_value defaults to the first bar; pass it when the curve starts
+    after the first return (e.g. a cumprod of returns, starting value 1).
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    start = equity[..., 0] if start_value is None else start_value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (equity[..., -1] / start) ** (periods_per_year / equity.shape[-1]) - 1
+
+
+# ================= DRAWDOWN =================
+def drawdown(equity, relative=True):
+    """Per-bar drawdown from the running peak: equity / peak - 1, or equity - peak."""
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity, axis=-1)
+    if relative:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return equity / peak - 1
+    return equity - peak
+
+
+def max_drawdown(equity, relative=True):
+    """(depth, duration): deepest drawdown (<= 0) and longest time below a peak, in bars."""
+    equity = np.asarray(equity, dtype=np.float64)
+    dd = drawdown(equity, relative)
+    bars = np.broadcast_to(np.arange(equity.shape[-1]), equity.shape)
+    last_peak = np.maximum.accumulate(np.where(dd < 0, 0, bars), axis=-1)
+    return np.nanmin(dd, axis=-1), (bars - last_peak).max(axis=-1)
+
+
+# ================= TRADES =================
+def trade_stats(pnl, result=None, n_results=None):
+    """Win rate, average win / loss, profit factor and expectancy.
+
+    pnl: trade PnLs; result: id (0..n_results-1) of the result each trade
+    belongs to, for scoring many results in one pass. Returns a dict of
+    arrays (one entry per result), or of scalars when result is None.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    scalar = result is None
+    result = np.zeros(len(pnl), dtype=np.int64) if scalar else np.asarray(result, dtype=np.int64)
+    n = n_results if n_results is not None else (int(result.max()) + 1 if len(result) else 1)
+
+    count = np.bincount(result, minlength=n)
+    wins = np.bincount(result, weights=pnl > 0, minlength=n)
+    gross_win = np.bincount(result, weights=np.maximum(pnl, 0), minlength=n)
+    gross_loss = np.bincount(result, weights=np.maximum(-pnl, 0), minlength=n)
+    losses = np.bincount(result, weights=pnl < 0, minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = {
+            "Trades": count,
+            "Win Rate %": wins / count * 100,
+            "Avg Win": gross_win / wins,
+            "Avg Loss": -gross_loss / losses,
+            "Profit Factor": gross_win / gross_loss,
+            "Expectancy": (gross_win - gross_loss) / count,
+        }
+    return {k: v[0] for k, v in out.items()} if scalar else out
+
+
+# ================= BREAKDOWNS =================
+def rolling_sharpe(rets, window, periods_per_year):
+    """Sharpe over a trailing window at every bar (NaN until the window fills)."""
+    r = np.nan_to_num(np.asarray(rets, dtype=np.float64))
+    pad = [(0, 0)] * (r.ndim - 1) + [(1, 0)]
+    s1 = np.pad(np.cumsum(r, axis=-1), pad)
+    s2 = np.pad(np.cumsum(r * r, axis=-1), pad)
+    out = np.full(r.shape, np.nan)
+    mean = (s1[..., window:] - s1[..., :-window]) / window
+    var = ((s2[..., window:] - s2[..., :-window]) - window * mean * mean) / (window - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., window - 1:] = mean / np.sqrt(np.maximum(var, 0)) * np.sqrt(periods_per_year)
+    return out
+
+
+def period_breakdown(equity, freq="ME"):
+    """Return and max drawdown per calendar period.
+
+    equity: time-indexed Series, or DataFrame with one column per result.
+    Returns a DataFrame per period (columns "return" / "max_dd", with the
+    result as the outer column level for a DataFrame input).
+    """
+    frame = equity.to_frame() if isinstance(equity, pd.Series) else equity
+    grouped = frame.resample(freq)
+    last = grouped.last()
+    prev = last.shift(1).fillna(grouped.first())
+    ret = last / prev - 1
+    dd = grouped.apply(lambda g: (g / g.cummax() - 1).min())
+    out = pd.concat({"return": ret, "max_dd": dd}, axis=1).swaplevel(axis=1).sort_index(axis=1)
+    return out[equity.name or 0] if isinstance(equity, pd.Series) else out
+
+
+# ================= SUMMARY =================
+def summary(equity, periods_per_year, trade_pnl=None, trade_result=None, names=None):
+    """One row of stats per equity curve (rows of a 2-D array).
+
+    Returns and drawdowns are relative to each curve's first value, so the
+    curves must be account equity with a positive start: a PnL curve from 0
+    (equity.mark_to_market's default) is rejected - pass start_capital
+    there, or use max_drawdown(curve, relative=False) for absolute stats.
+    """
+    curves = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    if curves.shape[-1] and not np.all(curves[:, 0] > 0):
+        raise ValueError("Equity curves must start above 0 (pass start_capital to build them from PnL)")
+    rets = returns(curves)
+    depth, duration = max_drawdown(curves)
+    table = {
+        "Total Return %": (curves[:, -1] / curves[:, 0] - 1) * 100,
+        "CAGR %": cagr(curves, periods_per_year) * 100,
+        "Sharpe": sharpe(rets, periods_per_year),
+        "Sortino": sortino(rets, periods_per_year),
+        "Max Drawdown %": depth * 100,
+        "Max DD Duration": duration,
+    }
+    if trade_pnl is not None:
+        result = np.zeros(len(trade_pnl), dtype=np.int64) if trade_result is None else trade_result
+        table.update(trade_stats(trade_pnl, result, n_results=len(curves)))
+    return pd.DataFrame(table, index=names)
+
+
+if __name__ == "__main__":
+    import equity as equity_curves
+    import ict_strategy
+
+    df = ict_strategy.load_data()
+    ind = ict_strategy.compute_indicators(df)
+    capital = 1000.0
+
+    names, curves, pnls, ids = [], [], [], []
+    for k, (name, variant) in enumerate(ict_strategy.VARIANTS.items()):
+        trades = ict_strategy.run_variant(ind, variant)
+        names.append(name)
+        curves.append(equity_curves.mark_to_market(trades, ind["close"], start_capital=capital)["equity"])
+        pnls.append(trades["pnl"])
+        ids.append(np.full(len(trades), k))
+
+    table = summary(np.array(curves), CRYPTO_5M, np.concatenate(pnls), np.concatenate(ids), names)
+    print(table.round(4).to_string())
+    monthly = period_breakdown(pd.DataFrame(np.array(curves).T, index=df.index, columns=names))
+    print(monthly.xs("return", axis=1, level=1).mul(100).round(3).to_string())
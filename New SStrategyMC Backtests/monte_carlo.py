@@ -0,0 +1,131 @@
+# Monte Carlo trade-sequence analysis
+#
+# The test scripts report one equity curve: the trades in the order they
+# happened. Here the same trades are reshuffled (order risk) or resampled in
+# blocks (keeps short-range streaks / clustering) into many alternative
+# sequences, held as one (paths x trades) array per chunk, and the
+# drawdown / final PnL / ruin statistics are taken across all paths.
+#
+# Each chunk draws from its own child of SeedSequence(seed), so a run is
+# reproducible for a given seed and chunk size.
+
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+N_PATHS = 100_000
+CHUNK_PATHS = 5_000         # paths held in memory at once (x n_trades x 8 bytes)
+BLOCK_SIZE = 5
+SEED = 42
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+# ================= PATH GENERATORS =================
+def shuffled_paths(pnl, n_paths, rng):
+    """Every path is a random permutation of the trades (same final PnL, new order)."""
+    return rng.permuted(np.broadcast_to(pnl, (n_paths, len(pnl))), axis=1)
+
+
+def block_bootstrap_paths(pnl, n_paths, rng, block_size=BLOCK_SIZE):
+    """Circular moving-block bootstrap: paths built from random runs of block_size trades.
+
+    block_size=1 is the plain i.i.d. bootstrap.
+    """
+    n = len(pnl)
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n] % n
+    return pnl[idx]
+
+
+# ================= STATISTICS =================
+def path_stats(paths, start_capital=None, ruin_fraction=0.5):
+    """Per-path final PnL, max drawdown and (with start_capital) a ruin flag.
+
+    Drawdown is measured from the running equity peak as in the test
+    scripts. A path is ruined once its cumulative PnL reaches
+    -start_capital * ruin_fraction. paths is overwritten with its equity.
+    """
+    equity = np.cumsum(paths, axis=1, out=paths)
+    peak = np.maximum.accumulate(equity, axis=1)
+    stats = {
+        "final_pnl": equity[:, -1].copy(),
+        "max_drawdown": (equity - peak).min(axis=1),
+        "min_equity": equity.min(axis=1),
+    }
+    if start_capital is not None:
+        stats["ruined"] = stats["min_equity"] <= -start_capital * ruin_fraction
+    return stats
+
+
+def simulate(pnl, n_paths=N_PATHS, method="shuffle", block_size=BLOCK_SIZE, seed=SEED,
+             chunk_paths=CHUNK_PATHS, start_capital=None, ruin_fraction=0.5):
+    """Monte Carlo statistics of n_paths resampled trade sequences.
+
+    method: "shuffle" (permutations) or "block" (block bootstrap).
+    Returns a dict of per-path arrays (see path_stats).
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        raise ValueError("No trades to resample")
+
+    n_chunks = -(-n_paths // chunk_paths)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    parts = []
+    for k, child in enumerate(seeds):
+        rng = np.random.default_rng(child)
+        size = min(chunk_paths, n_paths - k * chunk_paths)
+        if method == "shuffle":
+            paths = shuffled_paths(pnl, size, rng)
+        elif method == "block":
+            paths = block_bootstrap_paths(pnl, size, rng, block_size)
+        else:
+            raise ValueError(f"Unknown method: {method}")
+        parts.append(path_stats(paths, start_capital, ruin_fraction))
+
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def summary(stats, quantiles=QUANTILES):
+    """Quantile table of the per-path distributions, plus the risk of ruin."""
+    table = pd.DataFrame({
+        "Final PnL": np.quantile(stats["final_pnl"], quantiles),
+        "Max Drawdown": np.quantile(stats["max_drawdown"], quantiles),
+    }, index=[f"p{round(q * 100)}" for q in quantiles])
+    extra = {"P(loss)": float(np.mean(stats["final_pnl"] < 0))}
+    if "ruined" in stats:
+        extra["Risk of Ruin"] = float(np.mean(stats["ruined"]))
+    return table, extra
+
+
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    import ict_strategy
+
+    df = ict_strategy.load_data(days=3650)
+    ind = ict_strategy.compute_indicators(df)
+    pnl = ict_strategy.run_variant(ind, ict_strategy.VARIANTS["test1_state"])["pnl"]
+    print("Trades:", len(pnl), " Net PnL:", round(pnl.sum(), 2))
+
+    results = {}
+    for method in ["shuffle", "block"]:
+        t = time.time()
+        results[method] = simulate(pnl, method=method, start_capital=abs(pnl).sum() / 4)
+        table, extra = summary(results[method])
+        print(f"\n===== MONTE CARLO ({method}, {N_PATHS} paths, {time.time() - t:.1f}s) =====")
+        print(table.round(2).to_string())
+        print({k: round(v, 4) for k, v in extra.items()})
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    for method, stats in results.items():
+        axes[0].hist(stats["max_drawdown"], bins=100, alpha=0.5, label=method)
+        if method != "shuffle":         # a reordering keeps the sum: every shuffled path ends at the same PnL
+            axes[1].hist(stats["final_pnl"], bins=100, alpha=0.5, label=method)
+    axes[0].set_title("Max Drawdown distribution")
+    axes[1].set_title("Final PnL distribution")
+    for ax in axes:
+        ax.legend()
+        ax.grid(True)
+    plt.show()
@@ -0,0 +1,314 @@
+# Batched strategy evaluation over many price paths
+#
+# Bars are held as (paths x bars) matrices. Indicators are computed for all
+# paths at once along axis 1, the EMA / trade loops are compiled kernels
+# that walk every row (engine.run_backtest_paths, ema_strategies), and the
+# path dimension is split across threads (the kernels and the large NumPy
+# operations release the GIL).
+#
+# Paths come from a block bootstrap of the historical bars: blocks of
+# log returns are stitched together and each bar keeps its own
+# open / high / low (and volume) relative to its close, so intrabar ranges
+# and volume spikes stay realistic.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ema_strategies
+import engine
+import ict_strategy
+import monte_carlo
+from jit import HAVE_NUMBA, njit
+
+# ================= CONFIG =================
+N_PATHS = 1000
+BLOCK_SIZE = 288            # one day of 5m bars
+SEED = 42
+PATHS_PER_CHUNK = 16        # rows per task; bounds the (paths x bars x window) rolling temporaries
+
+# EMA strategies (backtests/bot1_backtest.py, backtests/bot3_backtest1.py)
+EMA_FAST = 12
+EMA_SLOW = 20
+VOLUME_WINDOW = 10
+VOLUME_SPIKE_RATIO = 1.5
+STOP_LOSS_PCT = 0.01
+TRADE_SIZE = 1
+FEE_RATE = 0.00075
+SLIPPAGE_RATE = 0.0002
+
+
+# ================= PATHS =================
+def bootstrap_bars(df, n_paths=N_PATHS, block_size=BLOCK_SIZE, seed=SEED):
+    """(paths x bars) OHLC(V) matrices resampled from one historical series."""
+    close = df["close"].to_numpy(dtype=np.float64)
+    log_ret = np.diff(np.log(close), prepend=np.log(close[0]))
+    idx = monte_carlo.block_bootstrap_paths(np.arange(len(close)), n_paths,
+                                            np.random.default_rng(seed), block_size)
+    idx[:, 0] = 0                               # every path starts from the first bar
+
+    bars = {"close": close[0] * np.exp(np.cumsum(log_ret[idx], axis=1))}
+    for col in ["open", "high", "low"]:
+        bars[col] = bars["close"] * (df[col].to_numpy(dtype=np.float64) / close)[idx]
+    if "volume" in df:
+        bars["volume"] = df["volume"].to_numpy(dtype=np.float64)[idx]
+    return bars
+
+
+def history_bars(df):
+    """The historical series itself as a one-path batch."""
+    return {col: df[col].to_numpy(dtype=np.float64)[None, :]
+            for col in ["open", "high", "low", "close", "volume"] if col in df}
+
+
+def map_paths(fn, bars, threads=None, chunk=PATHS_PER_CHUNK):
+    """fn(rows) over contiguous path chunks on a thread pool; results concatenated in order."""
+    n_paths = len(bars["close"])
+    starts = range(0, n_paths, chunk)
+    chunks = [{k: v[lo:lo + chunk] for k, v in bars.items()} for lo in starts]
+    threads = max(1, min(threads or os.cpu_count(), len(chunks)))
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return pd.concat(list(pool.map(fn, chunks)), ignore_index=True)
+
+
+# ================= 2D INDICATORS =================
+# Same values as the pandas expressions they replace, NaN warm-up included.
+# Without numba the rolling windows fall back to sliding_window_view
+# reductions (O(bars x window)).
+def shift(a, k):
+    out = np.full_like(a, np.nan)
+    out[:, k:] = a[:, :-k]
+    return out
+
+
+def _rolling(a, window, reduce):
+    out = np.full(a.shape, np.nan)
+    if a.shape[1] >= window:
+        out[:, window - 1:] = reduce(np.lib.stride_tricks.sliding_window_view(a, window, axis=1), axis=-1)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_extreme(a, window, sign):
+    """Monotonic-deque rolling max (sign=1) / min (sign=-1), O(bars) per row."""
+    rows, n = a.shape
+    out = np.full((rows, n), np.nan)
+    dq = np.empty(n, dtype=np.int64)
+    for p in range(rows):
+        head = 0
+        tail = 0
+        last_nan = -window
+        for i in range(n):
+            v = a[p, i]
+            if np.isnan(v):
+                last_nan = i
+            else:
+                while tail > head and sign * a[p, dq[tail - 1]] <= sign * v:
+                    tail -= 1
+                dq[tail] = i
+                tail += 1
+            while tail > head and dq[head] <= i - window:
+                head += 1
+            if i >= window - 1 and i - last_nan >= window:
+                out[p, i] = a[p, dq[head]]
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_median(a, window):
+    """Rolling median from a sorted window buffer (insert / delete by binary search)."""
+    rows, n = a.shape
+    out = np.full((rows, n), np.nan)
+    buf = np.empty(window)
+    for p in range(rows):
+        count = 0
+        nans = 0
+        for i in range(n):
+            if i >= window:
+                old = a[p, i - window]
+                if np.isnan(old):
+                    nans -= 1
+                else:
+                    j = np.searchsorted(buf[:count], old)
+                    buf[j:count - 1] = buf[j + 1:count].copy()
+                    count -= 1
+            v = a[p, i]
+            if np.isnan(v):
+                nans += 1
+            else:
+                j = np.searchsorted(buf[:count], v)
+                buf[j + 1:count + 1] = buf[j:count].copy()
+                buf[j] = v
+                count += 1
+            if i >= window - 1 and nans == 0:
+                h = count // 2
+                out[p, i] = buf[h] if count % 2 else (buf[h - 1] + buf[h]) / 2
+    return out
+
+
+def rolling_max(a, window):
+    return _rolling_extreme(a, window, 1.0) if HAVE_NUMBA else _rolling(a, window, np.max)
+
+
+def rolling_min(a, window):
+    return _rolling_extreme(a, window, -1.0) if HAVE_NUMBA else _rolling(a, window, np.min)
+
+
+def rolling_median(a, window):
+    return _rolling_median(a, window) if HAVE_NUMBA else _rolling(a, window, np.median)
+
+
+def rolling_mean(a, window):
+    c = np.cumsum(np.nan_to_num(a), axis=1)
+    out = np.full(a.shape, np.nan)
+    out[:, window - 1] = c[:, window - 1]
+    out[:, window:] = c[:, window:] - c[:, :-window]
+    return out / window
+
+
+def rolling_any(mask, window):
+    """mask.rolling(window).max().astype(bool): the NaN warm-up reads as True."""
+    out = rolling_max(mask.astype(np.float64), window)
+    return np.isnan(out) | (out > 0)
+
+
+@njit(cache=True, nogil=True)
+def ema(a, span, min_periods=0):
+    """Row-wise ewm(span, adjust=False).mean(), NaN before min_periods bars."""
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty(a.shape)
+    for p in range(a.shape[0]):
+        value = a[p, 0]
+        for i in range(a.shape[1]):
+            if i > 0:
+                value = alpha * a[p, i] + (1.0 - alpha) * value
+            out[p, i] = value if i + 1 >= min_periods else np.nan
+    return out
+
+
+# ================= ICT =================
+def ict_indicators(bars, times, params=None):
+    """ict_strategy.compute_indicators for every path (without the bitsets)."""
+    p = dict(ict_strategy.PARAMS)
+    if params:
+        p.update(params)
+    high, low, close, open_ = bars["high"], bars["low"], bars["close"], bars["open"]
+    state = p["event_state_bars"]
+    tod = pd.DatetimeIndex(times).time
+
+    range_high = rolling_max(high, p["htf_lookback"])
+    range_low = rolling_min(low, p["htf_lookback"])
+    equilibrium = (range_high + range_low) / 2
+    atr = rolling_mean(high - low, p["atr_period"])
+    swing_high = rolling_max(high, p["swing_lookback"])
+    swing_low = rolling_min(low, p["swing_lookback"])
+
+    return {
+        "high": high, "low": low, "close": close, "atr": atr,
+        "range_high": range_high, "range_low": range_low,
+        "in_ny": np.broadcast_to((tod >= p["ny_start"]) & (tod <= p["ny_end"]), close.shape),
+        "bull_bias": rolling_any(close > equilibrium, p["bias_state_bars"]),
+        "bear_bias": rolling_any(close < equilibrium, p["bias_state_bars"]),
+        "liq_long": rolling_any(low <= rolling_min(low, p["liq_lookback"]) * 1.0002, state),
+        "liq_short": rolling_any(high >= rolling_max(high, p["liq_lookback"]) * 0.9998, state),
+        "vol_ok": atr > rolling_median(atr, p["atr_median_bars"]),
+        "fvg_long": rolling_any((close > open_) & ((close - open_) > atr) & (low > shift(high, 2)), state),
+        "fvg_short": rolling_any((open_ > close) & ((open_ - close) > atr) & (high < shift(low, 2)), state),
+        "bull_mss": rolling_any(close > shift(swing_high, 1), state),
+        "bear_mss": rolling_any(close < shift(swing_low, 1), state),
+        "discount": close < equilibrium,
+        "premium": close > equilibrium,
+    }
+
+
+def ict_paths(bars, times, variant=None, params=None, threads=None):
+    """One row of ict_strategy.summarize stats per path."""
+    variant = ict_strategy.VARIANTS["test6_vol_filter"] if variant is None else variant
+    cfg = engine.make_config(variant)
+    long_conds, short_conds = ict_strategy.signal_conditions(variant)
+    prepared = {"day": engine.day_index(times)}
+
+    def run(chunk):
+        ind = ict_indicators(chunk, times, params)
+        long_signal = np.logical_and.reduce([ind[c] for c in long_conds])
+        short_signal = np.logical_and.reduce([ind[c] for c in short_conds])
+        trades, path = engine.run_backtest_paths(
+            ind["high"], ind["low"], ind["close"], ind["atr"], long_signal, short_signal, times, cfg,
+            range_low=ind["range_low"], range_high=ind["range_high"], prepared=prepared,
+        )
+        bounds = np.searchsorted(path, np.arange(len(chunk["close"]) + 1))
+        return pd.DataFrame([ict_strategy.summarize(trades[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])])
+
+    return map_paths(run, bars, threads)
+
+
+# ================= EMA + VOLUME (bot3) =================
+def ema_volume_signal(bars, ema_short=EMA_FAST, ema_long=EMA_SLOW,
+                      window=VOLUME_WINDOW, ratio=VOLUME_SPIKE_RATIO):
+    close = bars["close"]
+    fast = ema(close, ema_short, ema_short)          # ta's EMAIndicator (min_periods=window)
+    slow = ema(close, ema_long, ema_long)
+    vol_ratio = bars["volume"] / rolling_mean(bars["volume"], window)
+    return ema_strategies.volume_spike_signal(fast, slow, vol_ratio, ratio)
+
+
+def ema_volume_paths(bars, stop_pct=STOP_LOSS_PCT, size=TRADE_SIZE, threads=None, **signal_kwargs):
+    """Total PnL, trade count and win rate of the bot3 logic per path."""
+    def run(chunk):
+        n = len(chunk["close"])
+        signal = ema_volume_signal(chunk, **signal_kwargs)
+        trades = ema_strategies.stop_reverse_trades(chunk["close"], signal, stop_pct)
+        pnl = (trades["exit_price"] - trades["entry_price"]) * size * trades["side"]
+        count = np.bincount(trades["row"], minlength=n)
+        wins = np.bincount(trades["row"], weights=pnl > 0, minlength=n)
+        return pd.DataFrame({
+            "Total PnL": np.bincount(trades["row"], weights=pnl, minlength=n),
+            "Total Trades": count,
+            "Win Rate %": np.divide(wins, count, out=np.zeros(n), where=count > 0) * 100,
+        })
+
+    return map_paths(run, bars, threads)
+
+
+# ================= EMA CROSSOVER (bot1) =================
+def ema_crossover_paths(bars, fast=EMA_FAST, slow=EMA_SLOW, fee_rate=FEE_RATE,
+                        slippage_rate=SLIPPAGE_RATE, threads=None):
+    """bot1_backtest.py's always-in-market returns per path: total return and max drawdown."""
+    cost = (fee_rate + slippage_rate) * 2
+
+    def run(chunk):
+        close = chunk["close"]
+        ret, _ = ema_strategies.crossover_returns(close, ema(close, fast), ema(close, slow), cost)
+        equity = np.cumprod(1 + np.nan_to_num(ret), axis=1)
+        return pd.DataFrame({
+            "Total Return %": (equity[:, -1] - 1) * 100,
+            "Max Drawdown %": (equity[:, 1:] / np.maximum.accumulate(equity[:, 1:], axis=1) - 1).min(axis=1) * 100,
+        })
+
+    return map_paths(run, bars, threads)
+
+
+if __name__ == "__main__":
+    import time
+
+    df = ict_strategy.load_data(days=365)
+    bars = bootstrap_bars(df, N_PATHS)
+    print(f"{N_PATHS} bootstrapped paths x {len(df)} bars")
+
+    t = time.time()
+    ict = ict_paths(bars, df.index.to_numpy())
+    print(f"\n===== ICT (test6) across paths, {time.time() - t:.1f}s =====")
+    print(ict.describe(percentiles=[0.05, 0.5, 0.95]).round(2).to_string())
+
+    t = time.time()
+    cross = ema_crossover_paths(bars)
+    print(f"\n===== EMA crossover across paths, {time.time() - t:.1f}s =====")
+    print(cross.describe(percentiles=[0.05, 0.5, 0.95]).round(2).to_string())
+
+    if "volume" in bars:
+        t = time.time()
+        spike = ema_volume_paths(bars)
+        print(f"\n===== EMA + volume spike across paths, {time.time() - t:.1f}s =====")
+        print(spike.describe(percentiles=[0.05, 0.5, 0.95]).round(2).to_string())
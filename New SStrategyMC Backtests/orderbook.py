@@ -0,0 +1,233 @@
+# L2 order-book replay fills
+#
+# Bar-close fills assume any size trades at the close. This module replays
+# recorded L2 snapshots instead: a market order walks the book levels at the
+# snapshot in force when it is sent, and a stop order triggers at the first
+# snapshot whose touch crosses its level and then walks the book.
+#
+# Snapshot file (.l2), one per symbol and day:
+#   magic b"L2BOOK1\n" | u32 header length | JSON header | pad to 64 bytes
+#   times  int64[count]                  ns since epoch, ascending (the index)
+#   book   count x BOOK_DTYPE records    prices in ticks, sizes float32
+# Both blocks are memory-mapped, so opening a file is free and a lookup is
+# a binary search on the times block.
+
+import json
+import struct
+
+import numpy as np
+
+from engine import EXIT_SL
+from jit import njit, kernel_args
+
+# ================= CONFIG =================
+MAGIC = b"L2BOOK1\n"
+ALIGN = 64
+DEPTH = 20                  # levels per side stored
+MAX_AGE = np.timedelta64(60, "s")   # older snapshots do not count as "in force" (gaps, end of file)
+
+
+def book_dtype(depth=DEPTH):
+    return np.dtype([
+        ("bid_px", "i4", depth),    # ticks, best first
+        ("bid_sz", "f4", depth),
+        ("ask_px", "i4", depth),
+        ("ask_sz", "f4", depth),
+    ])
+
+
+# ================= FILES =================
+def write_snapshots(path, times, bid_px, bid_sz, ask_px, ask_sz, tick_size):
+    """Store snapshots (rows = snapshots, columns = levels, best first).
+
+    Prices are rounded to integer ticks; missing levels should have size 0.
+    """
+    times = np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+    if np.any(np.diff(times) < 0):
+        raise ValueError("Snapshot times must be ascending")
+    depth = np.shape(bid_px)[1]
+    book = np.zeros(len(times), dtype=book_dtype(depth))
+    book["bid_px"] = np.rint(np.asarray(bid_px) / tick_size)
+    book["ask_px"] = np.rint(np.asarray(ask_px) / tick_size)
+    book["bid_sz"] = bid_sz
+    book["ask_sz"] = ask_sz
+
+    header = json.dumps({"count": len(times), "depth": depth, "tick_size": tick_size}).encode()
+    head = MAGIC + struct.pack("<I", len(header)) + header
+    head += b"\0" * (-len(head) % ALIGN)
+    with open(path, "wb") as f:
+        f.write(head)
+        f.write(times.tobytes())
+        f.write(book.tobytes())
+
+
+def open_book(path):
+    """Memory-mapped snapshot file -> {"times", "book", "tick_size", "depth"}."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an L2 snapshot file")
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size))
+    offset = len(MAGIC) + 4 + size
+    offset += -offset % ALIGN
+    count, depth = header["count"], header["depth"]
+    times = np.memmap(path, dtype=np.int64, mode="r", offset=offset, shape=(count,))
+    book = np.memmap(path, dtype=book_dtype(depth), mode="r", offset=offset + 8 * count, shape=(count,))
+    return {"times": times, "book": book, "tick_size": header["tick_size"], "depth": depth}
+
+
+def snapshot_index(book, times, max_age=MAX_AGE):
+    """Index of the snapshot in force at each time (-1 if none within max_age)."""
+    t = np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+    idx = np.searchsorted(book["times"], t, side="right") - 1
+    stale = (idx < 0) | (t - book["times"][np.maximum(idx, 0)] > max_age.astype("timedelta64[ns]").astype(np.int64))
+    return np.where(stale, -1, idx)
+
+
+# ================= MARKET ORDERS =================
+def walk_book(book, idx, side, qty):
+    """Fill market orders against snapshots idx.
+
+    side: +1 buys (walk the asks), -1 sells (walk the bids); qty > 0.
+    Returns (avg_price, filled) - an order larger than the stored depth is
+    only partly filled; nothing fills before the first snapshot.
+    """
+    idx = np.asarray(idx)
+    side = np.broadcast_to(np.asarray(side), idx.shape)
+    qty = np.broadcast_to(np.asarray(qty, dtype=np.float64), idx.shape)
+    rows = book["book"][np.maximum(idx, 0)]
+    buy = (side > 0)[:, None]
+    px = np.where(buy, rows["ask_px"], rows["bid_px"]).astype(np.float64) * book["tick_size"]
+    sz = np.where(buy, rows["ask_sz"], rows["bid_sz"]).astype(np.float64)
+    sz[idx < 0] = 0
+
+    before = np.cumsum(sz, axis=1) - sz                 # size available ahead of each level
+    take = np.clip(qty[:, None] - before, 0, sz)
+    filled = take.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = (take * px).sum(axis=1) / filled
+    return avg, filled
+
+
+def market_fills(book, times, side, qty):
+    """Market orders sent at `times`: (avg_price, filled)."""
+    return walk_book(book, snapshot_index(book, times), side, qty)
+
+
+# ================= STOP ORDERS =================
+@njit(cache=True, nogil=True)
+def _first_cross(best_bid, best_ask, start, end, side, level):
+    """Per order, first snapshot in [start, end) whose touch reaches the stop (end if none).
+
+    A sell stop triggers when the best bid trades down to it, a buy stop
+    when the best ask trades up to it.
+    """
+    out = np.empty(len(start), dtype=np.int64)
+    for k in range(len(start)):
+        out[k] = end[k]
+        for j in range(max(start[k], 0), end[k]):
+            if (side[k] < 0 and best_bid[j] <= level[k]) or (side[k] > 0 and best_ask[j] >= level[k]):
+                out[k] = j
+                break
+    return out
+
+
+def stop_fills(book, start_times, end_times, side, stop, qty):
+    """Stop orders live from start_times until end_times.
+
+    Returns (avg_price, filled, trigger_idx); untriggered orders have
+    filled 0, avg_price NaN and trigger_idx -1.
+    """
+    t0 = np.asarray(start_times, dtype="datetime64[ns]").astype(np.int64)
+    t1 = np.asarray(end_times, dtype="datetime64[ns]").astype(np.int64)
+    start = np.searchsorted(book["times"], t0, side="left")     # snapshots inside [start, end]
+    end = np.searchsorted(book["times"], t1, side="right")
+    n = len(start)
+    side = np.broadcast_to(np.asarray(side), (n,)).astype(np.int64)
+    stop_ticks = np.broadcast_to(np.asarray(stop, dtype=np.float64), (n,)) / book["tick_size"]
+    rows = book["book"]
+    trigger = np.asarray(_first_cross(*kernel_args(
+        rows["bid_px"][:, 0].astype(np.float64), rows["ask_px"][:, 0].astype(np.float64),
+        start.astype(np.int64), end.astype(np.int64), side, stop_ticks)), dtype=np.int64)
+    hit = trigger < end
+    trigger = np.where(hit, trigger, -1)
+    avg, filled = walk_book(book, trigger, side, qty)
+    return np.where(hit, avg, np.nan), np.where(hit, filled, 0.0), trigger
+
+
+# ================= TRADE ARRAYS =================
+def _blend(book_px, filled, bar_px, qty):
+    """Average price of the book-filled part plus the rest at the bar price."""
+    book_part = np.where(filled > 0, book_px * filled, 0.0)
+    return (book_part + bar_px * (qty - filled)) / qty
+
+
+def fill_trades(trades, book, bar_times, bar_length=np.timedelta64(5, "m")):
+    """Re-price an engine.TRADE_DTYPE array against the book.
+
+    Entries are market orders at the signal bar's close for the trade's
+    full size (all its exit legs); stop-loss legs are stop orders live over
+    their exit bar, falling back to a market order at the bar close if the
+    book never touches the stop; target legs keep their limit price.
+    Whatever the book cannot fill (no snapshot in force, or depth
+    exhausted) is priced at the bar price as before.
+    Returns (copy with entry_price / exit_price / pnl replaced, units per
+    row the book could not fill).
+    """
+    bar_times = np.asarray(bar_times, dtype="datetime64[ns]")
+    out = trades.copy()
+    if len(trades) == 0:
+        return out, np.zeros(0)
+    side = trades["side"].astype(np.int64)
+    size = np.abs(trades["size"])
+
+    # entries: one market order per trade for the summed leg sizes
+    _, first, inverse = np.unique(trades["trade_id"], return_index=True, return_inverse=True)
+    order_qty = np.bincount(inverse, weights=size)
+    entry_time = bar_times[trades["entry_idx"][first]] + bar_length
+    entry_px, entry_filled = market_fills(book, entry_time, side[first], order_qty)
+    out["entry_price"] = _blend(entry_px, entry_filled, trades["entry_price"][first], order_qty)[inverse]
+    unfilled = (order_qty - entry_filled)[inverse] * size / order_qty[inverse]
+
+    # stop-loss exits: sell stops for longs, buy stops for shorts
+    sl = np.flatnonzero(trades["reason"] == EXIT_SL)
+    if len(sl):
+        bar_open = bar_times[trades["exit_idx"][sl]]
+        stop_px, stop_filled, _ = stop_fills(book, bar_open, bar_open + bar_length, -side[sl],
+                                             trades["stop"][sl], size[sl])
+        mkt_px, mkt_filled = market_fills(book, bar_open + bar_length, -side[sl], size[sl])
+        px = np.where(stop_filled > 0, stop_px, mkt_px)
+        filled = np.where(stop_filled > 0, stop_filled, mkt_filled)
+        out["exit_price"][sl] = _blend(px, filled, trades["exit_price"][sl], size[sl])
+        unfilled[sl] += size[sl] - filled
+
+    out["pnl"] = (out["exit_price"] - out["entry_price"]) * size * side
+    return out, unfilled
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    import ict_strategy
+
+    # Synthetic 1s book around the 5m closes, to exercise the format and the fills
+    df = ict_strategy.load_data()
+    day = df.loc[df.index.normalize() == df.index.normalize()[-1]]
+    t = np.arange(np.datetime64(day.index[0], "s"), np.datetime64(day.index[-1], "s") + 300).astype("datetime64[ns]")
+    rng = np.random.default_rng(0)
+    mid = np.interp(t.astype(np.int64), day.index.to_numpy().astype(np.int64), day["close"].to_numpy())
+    mid += np.cumsum(rng.normal(0, 0.5, len(t)))
+    levels = np.arange(DEPTH) * 0.5
+    half = 0.25 + rng.exponential(0.5, len(t))[:, None]
+    sizes = rng.exponential(0.3, (len(t), DEPTH)) * (1 + np.arange(DEPTH) / 4)
+    write_snapshots("sample.l2", t, mid[:, None] - half - levels, sizes,
+                    mid[:, None] + half + levels, sizes[:, ::-1], tick_size=0.01)
+    print(f"{len(t)} snapshots, {os.path.getsize('sample.l2') / 1e6:.1f} MB")
+
+    book = open_book("sample.l2")
+    n = 100_000
+    when = t[0] + rng.integers(0, len(t), n).astype("timedelta64[s]")
+    start = time.time()
+    px, filled = market_fills(book, when, rng.choice([-1, 1], n), rng.uniform(0.01, 5, n))
+    print(f"{n} market orders in {time.time() - start:.3f}s, mean fill {np.nanmean(px):.2f}")
@@ -0,0 +1,160 @@
+# Parallel parameter sweep over shared-memory market data
+#
+# The OHLC arrays are published once in multiprocessing.shared_memory; pool
+# workers attach to them by name instead of receiving a pickled copy. Each
+# task is one set of indicator parameters (the expensive part) plus every
+# trade-management combination that can reuse those indicators.
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import costs as cost_models
+import ict_strategy
+
+COLUMNS = ["open", "high", "low", "close"]
+
+_SHARED = {}        # worker-side: attached blocks + arrays
+
+
+# ================= GRID =================
+def param_grid(**axes):
+    """Cartesian product of keyword axes -> list of param dicts."""
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+
+def split_params(params):
+    """(indicator params, trade/variant params) of one grid point."""
+    ind = {k: v for k, v in params.items() if k in ict_strategy.PARAMS}
+    rest = {k: v for k, v in params.items() if k not in ict_strategy.PARAMS}
+    return ind, rest
+
+
+def group_tasks(grid):
+    """Group grid points sharing indicator params into one task each."""
+    tasks = {}
+    for params in grid:
+        ind, rest = split_params(params)
+        key = tuple(sorted(ind.items()))
+        tasks.setdefault(key, (ind, []))[1].append(rest)
+    return list(tasks.values())
+
+
+# ================= SHARED MEMORY =================
+def publish(df):
+    """Copy the bar arrays into shared memory once.
+
+    Returns (blocks, spec); keep blocks alive for the duration of the sweep
+    and pass them to release() afterwards. spec is the small picklable
+    description workers use to attach.
+    """
+    arrays = {"time": df.index.to_numpy().astype("datetime64[ns]").astype(np.int64)}
+    for col in COLUMNS:
+        arrays[col] = df[col].to_numpy(dtype=np.float64)
+
+    blocks, spec = [], {}
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        blocks.append(shm)
+        spec[name] = (shm.name, arr.dtype.str, arr.shape)
+    return blocks, spec
+
+
+def release(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def attach(spec):
+    """Zero-copy views of published arrays (handles kept in _SHARED)."""
+    arrays = {}
+    for name, (shm_name, dtype, shape) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHARED.setdefault("blocks", []).append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return arrays
+
+
+def frame_from_arrays(arrays):
+    index = pd.DatetimeIndex(arrays["time"].view("datetime64[ns]"), name="open_time")
+    return pd.DataFrame({col: arrays[col] for col in COLUMNS}, index=index, copy=False)
+
+
+def _init_worker(spec):
+    _SHARED["df"] = frame_from_arrays(attach(spec))
+
+
+# ================= WORKER =================
+def evaluate(df, ind_params, trade_params, base_variant, costs=None):
+    """Rows for one indicator param set and all its trade variants (net of costs, if given)."""
+    ind = ict_strategy.compute_indicators(df, ind_params)
+    rows = []
+    for extra in trade_params:
+        variant = dict(base_variant)
+        variant.update(extra)
+        trades = ict_strategy.run_variant(ind, variant)
+        if costs is not None:
+            trades = cost_models.apply_costs(trades, ind, costs)
+        stats = ict_strategy.summarize(trades)
+        rows.append({**ind_params, **extra, **stats})
+    return rows
+
+
+def _run_task(ind_params, trade_params, base_variant, costs):
+    return evaluate(_SHARED["df"], ind_params, trade_params, base_variant, costs)
+
+
+# ================= RUNNER =================
+def run_sweep(df, grid, base_variant=None, workers=None, on_result=None, out_csv=None, costs=None):
+    """Evaluate every grid point across a process pool.
+
+    grid:      list of param dicts (see param_grid); keys from
+               ict_strategy.PARAMS are indicator params, the rest override
+               the variant / engine config.
+    on_result: called with each batch of rows as soon as its task finishes.
+    out_csv:   rows are appended here as they arrive, so a long sweep can be
+               watched (or salvaged) while it runs.
+    costs:     a costs.py model (e.g. costs.CRYPTO_COSTS) -> stats net of costs.
+
+    Returns a DataFrame with one row per grid point.
+    """
+    base_variant = ict_strategy.VARIANTS["test6_vol_filter"] if base_variant is None else base_variant
+    workers = workers or os.cpu_count()
+    tasks = group_tasks(grid)
+
+    rows = []
+    blocks, spec = publish(df)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as pool:
+            futures = [pool.submit(_run_task, ind, trade, base_variant, costs) for ind, trade in tasks]
+            for fut in as_completed(futures):
+                batch = fut.result()
+                rows.extend(batch)
+                if out_csv:
+                    pd.DataFrame(batch).to_csv(out_csv, mode="a", index=False,
+                                               header=not os.path.exists(out_csv))
+                if on_result:
+                    on_result(batch)
+    finally:
+        release(blocks)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    df = ict_strategy.load_data()
+    grid = param_grid(
+        htf_lookback=[24, 48, 96],
+        liq_lookback=[10, 20, 40],
+        swing_lookback=[3, 5, 8],
+        event_state_bars=[3, 5, 8],
+    )
+    print(f"Sweeping {len(grid)} parameter sets on {os.cpu_count()} cores")
+    results = run_sweep(df, grid, on_result=lambda batch: print(f"done: {batch[0]}"))
+    print(results.sort_values("Net PnL", ascending=False).head(10).to_string())
@@ -7,6 +7,8 @@ import numpy as np
 from datetime import timedelta, time
 import matplotlib.pyplot as plt
 
+import bitset
+
 # ================= CONFIG =================
 CSV_FILE = "btcusd.csv"
 LOT_SIZE = 0.05
@@ -94,17 +96,13 @@ df["discount"] = df["close"] < df["equilibrium"]
 df["premium"] = df["close"] > df["equilibrium"]
 
 # ================= ENTRY SIGNALS (WITH VOL FILTER) =================
-df["long_signal"] = (
-    df["in_ny"] & df["vol_ok"] &
-    df["bull_bias"] & df["liq_long"] &
-    df["fvg_long"] & df["bull_mss"] & df["discount"]
-)
-
-df["short_signal"] = (
-    df["in_ny"] & df["vol_ok"] &
-    df["bear_bias"] & df["liq_short"] &
-    df["fvg_short"] & df["bear_mss"] & df["premium"]
-)
+LONG_CONDITIONS = ["in_ny", "vol_ok", "bull_bias", "liq_long", "fvg_long", "bull_mss", "discount"]
+SHORT_CONDITIONS = ["in_ny", "vol_ok", "bear_bias", "liq_short", "fvg_short", "bear_mss", "premium"]
+
+packed = {c: bitset.pack(df[c].to_numpy()) for c in set(LONG_CONDITIONS + SHORT_CONDITIONS)}
+
+df["long_signal"] = bitset.unpack(bitset.and_all(packed[c] for c in LONG_CONDITIONS), len(df))
+df["short_signal"] = bitset.unpack(bitset.and_all(packed[c] for c in SHORT_CONDITIONS), len(df))
 
 # ================= BACKTEST ENGINE =================
 position = None
@@ -0,0 +1,170 @@
+# Walk-forward optimization
+#
+# Rolling or anchored train/test folds over the full history. Indicators are
+# causal, so each indicator param set is computed once on the whole history
+# and every fold simply runs the engine on its bar window - overlapping
+# windows share all of the indicator work.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ict_strategy
+import sweep
+
+# ================= CONFIG =================
+TRAIN_DAYS = 60
+TEST_DAYS = 14
+ANCHORED = False
+OBJECTIVE = "Net PnL"
+
+
+# ================= FOLDS =================
+def make_folds(times, train_days=TRAIN_DAYS, test_days=TEST_DAYS, anchored=ANCHORED, step_days=None):
+    """Bar index windows for each fold.
+
+    Rolling folds slide the train window by step_days (default test_days);
+    anchored folds keep the train start at the first bar. Test windows
+    follow their train window back to back, so they tile the history.
+    """
+    times = pd.DatetimeIndex(times)
+    step = pd.Timedelta(days=step_days or test_days)
+    train, test = pd.Timedelta(days=train_days), pd.Timedelta(days=test_days)
+
+    folds = []
+    first, last = times[0], times[-1]
+    while True:
+        test_start = first + train + step * len(folds)
+        if test_start >= last:
+            break
+        train_start = first if anchored else test_start - train
+        lo, mid, hi = np.searchsorted(times, [train_start, test_start, test_start + test])
+        folds.append({"fold": len(folds), "train": (int(lo), int(mid)), "test": (int(mid), int(hi))})
+    return folds
+
+
+def _param_key(params):
+    return tuple(sorted(params.items()))
+
+
+# ================= WORKERS =================
+def _score_task(ind_params, trade_params, base_variant, folds, objective):
+    """Train-window objective of every trade variant on every fold."""
+    ind = ict_strategy.compute_indicators(sweep._SHARED["df"], ind_params)
+    rows = []
+    for extra in trade_params:
+        variant = dict(base_variant)
+        variant.update(extra)
+        for fold in folds:
+            stats = ict_strategy.summarize(ict_strategy.run_variant(ind, variant, *fold["train"]))
+            rows.append({"fold": fold["fold"], **ind_params, **extra, "train_score": stats[objective]})
+    return rows
+
+
+def _test_task(ind_params, fold_params, base_variant):
+    """Out-of-sample trades on each fold's test window for folds whose chosen
+    params share ind_params: (fold, trade params) pairs, one indicator pass.
+
+    A position still open at the end of a test window is closed at that
+    window's last close (engine.EXIT_END), so no out-of-sample PnL is lost.
+    """
+    ind = ict_strategy.compute_indicators(sweep._SHARED["df"], ind_params)
+    out = []
+    for fold, extra in fold_params:
+        variant = dict(base_variant)
+        variant.update(extra)
+        variant["close_at_end"] = True
+        out.append((fold["fold"], ict_strategy.run_variant(ind, variant, *fold["test"])))
+    return out
+
+
+# ================= PIPELINE =================
+def walk_forward(df, grid, base_variant=None, folds=None, objective=OBJECTIVE, workers=None):
+    """Optimize on each train fold, evaluate the winner on the next test fold.
+
+    Returns (fold_table, oos) where fold_table has the chosen params and
+    train / test stats per fold and oos is the stitched out-of-sample trade
+    list with its equity curve. Positions open at the end of a test window
+    are closed at its last bar.
+    """
+    base_variant = ict_strategy.VARIANTS["test6_vol_filter"] if base_variant is None else base_variant
+    folds = make_folds(df.index) if folds is None else folds
+    workers = workers or os.cpu_count()
+    times = df.index
+
+    blocks, spec = sweep.publish(df)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=sweep._init_worker, initargs=(spec,)) as pool:
+            # ===== train: every param set scored on every fold at once =====
+            futures = [pool.submit(_score_task, ind, trade, base_variant, folds, objective)
+                       for ind, trade in sweep.group_tasks(grid)]
+            scores = pd.DataFrame([row for fut in futures for row in fut.result()])
+
+            param_cols = [c for c in scores.columns if c not in ("fold", "train_score")]
+            best = scores.loc[scores.groupby("fold")["train_score"].idxmax()]
+
+            # the frame upcasts mixed int / float grids to float; map each
+            # winner back to its grid point so params keep their types
+            by_key = {_param_key(p): p for p in grid}
+            chosen = {int(fold): by_key[_param_key(params)]
+                      for fold, params in zip(best["fold"], best[param_cols].to_dict("records"))}
+
+            # ===== test: one task per distinct indicator param set =====
+            groups = {}
+            for fold in folds:
+                ind_params, extra = sweep.split_params(chosen[fold["fold"]])
+                groups.setdefault(_param_key(ind_params), (ind_params, []))[1].append((fold, extra))
+            futures = [pool.submit(_test_task, ind, fold_params, base_variant)
+                       for ind, fold_params in groups.values()]
+            results = dict(r for fut in futures for r in fut.result())
+    finally:
+        sweep.release(blocks)
+
+    fold_rows, oos = [], []
+    for fold in folds:
+        trades = results[fold["fold"]]
+        stats = ict_strategy.summarize(trades)
+        fold_rows.append({
+            "fold": fold["fold"],
+            "train_start": times[fold["train"][0]], "test_start": times[fold["test"][0]],
+            "test_end": times[fold["test"][1] - 1],
+            **chosen[fold["fold"]],
+            "train_score": best.set_index("fold").loc[fold["fold"], "train_score"],
+            **{f"test {k}": v for k, v in stats.items()},
+        })
+        oos.append(pd.DataFrame({
+            "fold": fold["fold"],
+            "exit_time": times[trades["exit_idx"]],
+            "pnl": trades["pnl"],
+        }))
+
+    oos = pd.concat(oos, ignore_index=True) if oos else pd.DataFrame(columns=["fold", "exit_time", "pnl"])
+    oos["equity"] = oos["pnl"].cumsum()
+    return pd.DataFrame(fold_rows), oos
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    df = ict_strategy.load_data(days=3650)
+    grid = sweep.param_grid(
+        htf_lookback=[24, 48, 96],          # int indicator params ...
+        event_state_bars=[3, 5, 8],
+        atr_sl_mult=[1.0, 1.5, 2.0],        # ... mixed with float trade params
+        tp2_r=[2.0, 3.0],
+    )
+    folds = make_folds(df.index)
+    print(f"{len(folds)} folds x {len(grid)} parameter sets")
+
+    fold_table, oos = walk_forward(df, grid, folds=folds)
+    print(fold_table.round(4).to_string())
+    print("\nOut-of-sample Net PnL:", round(oos["pnl"].sum(), 2))
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(oos["exit_time"], oos["equity"], label="Stitched OOS Equity")
+    plt.title("ICT Walk-Forward – Out-of-Sample Equity")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
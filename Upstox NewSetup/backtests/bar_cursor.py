@@ -0,0 +1,93 @@
+# bar_cursor.py
+# Step-through replay over time-sorted candle arrays.
+#
+# A BarCursor holds a series' columns as numpy arrays and a position that
+# only moves forward: advance(t) makes every row with time <= t visible.
+# History "up to now" is a slice of the full arrays (a view, never a copy),
+# so replaying a day bar by bar is linear in the number of rows.
+#
+#   ce = BarCursor(ce_5["time"], close=ce_5["close"], volume=ce_5["volume"])
+#   for ts in timeline:
+#       ce.advance(ts)
+#       ce.last("close"), ce.view("volume")[-11:-1]
+import numpy as np
+import pandas as pd
+
+
+def _ns(t):
+    return pd.Timestamp(t).value
+
+
+class BarCursor:
+    """Monotone cursor over one time-sorted series.
+
+    times: bar timestamps (sorted ascending); columns: name -> values, all
+    the same length as times. Columns computed over the full series (e.g.
+    causal EMAs) can be added up front and read at the cursor like raw ones.
+    """
+
+    def __init__(self, times, **columns):
+        self._times = pd.to_datetime(pd.Series(times)).astype("datetime64[ns]").astype(np.int64).tolist()
+        self.columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        for name, values in self.columns.items():
+            if len(values) != len(self._times):
+                raise ValueError(f"Column {name} has {len(values)} rows, times has {len(self._times)}")
+        self.pos = 0    # rows visible so far
+
+    @classmethod
+    def from_frame(cls, df, columns, time_col="time"):
+        return cls(df[time_col], **{c: df[c] for c in columns})
+
+    def add(self, name, values):
+        """Attach a precomputed full-length column."""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(self._times):
+            raise ValueError(f"Column {name} has {len(values)} rows, times has {len(self._times)}")
+        self.columns[name] = values
+
+    def advance(self, t):
+        """Reveal every row with time <= t. Earlier times than the last call are a no-op."""
+        t, times, pos, n = _ns(t), self._times, self.pos, len(self._times)
+        while pos < n and times[pos] <= t:
+            pos += 1
+        self.pos = pos
+        return pos
+
+    def __len__(self):
+        return self.pos
+
+    def view(self, name):
+        """History of a column up to the cursor (no copy)."""
+        return self.columns[name][:self.pos]
+
+    def last(self, name, back=0):
+        """Value `back` rows before the latest visible one (NaN if not there yet)."""
+        i = self.pos - 1 - back
+        return self.columns[name][i] if i >= 0 else np.nan
+
+    @property
+    def time(self):
+        """Timestamp of the latest visible row (None before the first)."""
+        return pd.Timestamp(self._times[self.pos - 1]) if self.pos else None
+
+
+class AlignedCursors:
+    """Several BarCursors advanced together to the same timestamp.
+
+    Series on different grids (5m CE / PE, 15m HTF) line up by time: after
+    advance(t) each one shows its own rows up to t.
+    """
+
+    def __init__(self, **cursors):
+        self.cursors = cursors
+
+    def advance(self, t):
+        for cursor in self.cursors.values():
+            cursor.advance(t)
+
+    def __getitem__(self, name):
+        return self.cursors[name]
+
+    def ready(self, min_rows):
+        """True once every cursor has at least min_rows[name] rows visible."""
+        return all(len(self.cursors[name]) >= n for name, n in min_rows.items())
@@ -5,9 +5,12 @@ import requests
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dateutil import rrule, parser
 from datetime import datetime, timedelta, time
 
+from bar_cursor import AlignedCursors, BarCursor
+
 # ------------------ CONFIG ------------------
 API_BASE = os.getenv("API_BASE", "https://api-hft.upstox.com")  # change if needed
 ACCESS_TOKEN = os.getenv("UPSTOX_ACCESS_TOKEN", None)
@@ -21,6 +24,9 @@ EMA_SLOW = 20
 EMA_HTF = 50    # HTF EMA on 15-min bars
 TIMEFRAME_MIN = 5
 HTF_MIN = 15
+FETCH_WORKERS = 8   # concurrent day fetches (HTTP bound)
+SIM_WORKERS = os.cpu_count()
+PREFETCH_DAYS = 16  # days fetched / simulating at once
 
 # backtest date range (1 month default)
 END_DATE = datetime.utcnow().date()
@@ -182,10 +188,10 @@ def compute_stop_price_for_5pct(invested_amt, lots, lot_size, entry_price, side)
     else:
         return entry_price + loss_per_unit
 
-def backtest_one_day(instruments, date):
+def fetch_day(instruments, date):
     """
-    Simulate the bot running every 5-min for a single trading date.
-    Returns list of trades executed that day (each trade dict includes pnl and timestamps).
+    All the broker data one trading date needs: the ATM CE / PE chosen at the open
+    and their 5-min and 15-min candles. Pure I/O, so several days can be fetched at once.
     """
     # Determine market day timeframe
     day_start = datetime.combine(date, MARKET_OPEN)
@@ -244,6 +250,19 @@ def backtest_one_day(instruments, date):
 
     ce_5, ce_15 = fetch_opt_df(chosen_ce)
     pe_5, pe_15 = fetch_opt_df(chosen_pe)
+    return {"chosen_ce": chosen_ce, "chosen_pe": chosen_pe, "ce_5": ce_5, "ce_15": ce_15, "pe_5": pe_5, "pe_15": pe_15}
+
+def simulate_day(date, data):
+    """
+    Simulate the bot running every 5-min over one day of fetched data (see fetch_day).
+    Returns list of trades executed that day (each trade dict includes pnl and timestamps).
+    """
+    day_start = datetime.combine(date, MARKET_OPEN)
+    day_end = datetime.combine(date, MARKET_CLOSE)
+    chosen_ce, chosen_pe = data["chosen_ce"], data["chosen_pe"]
+    # time-sorted once: the cursors and the EOD exit below read the same frames
+    ce_5, ce_15, pe_5, pe_15 = (data[k].sort_values("time", kind="stable")
+                                for k in ("ce_5", "ce_15", "pe_5", "pe_15"))
 
     # Create a unified timeline of 5-min bars between market open and close
     timeline = pd.date_range(start=day_start, end=day_end, freq=f"{TIMEFRAME_MIN}T")
@@ -252,61 +271,58 @@ def backtest_one_day(instruments, date):
     # We'll maintain entry state (single position at a time per day)
     position = None
 
+    # Step-through cursors over each series; EMAs are causal, so they are computed
+    # once over the full day and read at the cursor instead of re-run every bar
+    def cursor(df, emas):
+        c = BarCursor.from_frame(df, ["close", "volume"])
+        for name, period in emas.items():
+            c.add(name, calculate_ema(df["close"].astype(float), period))
+        return c
+
+    bars = AlignedCursors(
+        ce_5=cursor(ce_5, {"ema_fast": EMA_FAST, "ema_slow": EMA_SLOW}),
+        pe_5=cursor(pe_5, {"ema_fast": EMA_FAST, "ema_slow": EMA_SLOW}),
+        ce_15=cursor(ce_15, {"ema_htf": EMA_HTF}),
+        pe_15=cursor(pe_15, {"ema_htf": EMA_HTF}),
+    )
+    min_rows = {"ce_5": EMA_SLOW, "ce_15": EMA_HTF, "pe_5": EMA_SLOW, "pe_15": EMA_HTF}
+
+    # compute volumes & ratio on latest 5-min
+    def vol_ratio(hist5):
+        vols = hist5.view("volume")
+        if len(vols) < 11: return 1.0
+        avg_prev10 = vols[-11:-1].mean()
+        latest_vol = vols[-1]
+        return latest_vol / avg_prev10 if avg_prev10 > 0 else 1.0
+
+    # determine crossover signals (we detect change-of-relation by looking at last two EMA comparisons)
+    def ema_relation(hist5):
+        def rel(back):
+            fast, slow = hist5.last("ema_fast", back), hist5.last("ema_slow", back)
+            return "above" if fast > slow else ("below" if fast < slow else "equal")
+        return rel(1), rel(0)
+
     # iterate over timeline
     for ts in timeline:
-        # get historical bars up to current ts for the chosen instrument price series
-        # but we must compute EMA on the instrument that we will trade (option chosen after signal)
-        # We'll compute EMAs for both CE and PE and then decide which instrument to use based on signal.
-        # Align bars: find rows <= ts
-        def get_row_slice(df, t):
-            df_t = df[df["time"] <= pd.to_datetime(t)].copy()
-            return df_t
-
-        ce_hist_5 = get_row_slice(ce_5, ts)
-        pe_hist_5 = get_row_slice(pe_5, ts)
-        ce_hist_15 = get_row_slice(ce_15, ts)
-        pe_hist_15 = get_row_slice(pe_15, ts)
+        # Align bars: every series shows its rows <= ts
+        bars.advance(ts)
+        ce_hist_5, pe_hist_5 = bars["ce_5"], bars["pe_5"]
 
         # need at least max(EMA_SLOW, EMA_HTF) bars
-        if len(ce_hist_5) < EMA_SLOW or len(ce_hist_15) < EMA_HTF or len(pe_hist_5) < EMA_SLOW or len(pe_hist_15) < EMA_HTF:
+        if not bars.ready(min_rows):
             continue
 
-        # compute EMAs for CE
-        ce_close_5 = ce_hist_5["close"].astype(float)
-        ce_ema12 = calculate_ema(ce_close_5, EMA_FAST).iloc[-1]
-        ce_ema20 = calculate_ema(ce_close_5, EMA_SLOW).iloc[-1]
-        ce_close_15 = ce_hist_15["close"].astype(float)
-        ce_ema50_htf = calculate_ema(ce_close_15, EMA_HTF).iloc[-1]
-
-        # compute EMAs for PE
-        pe_close_5 = pe_hist_5["close"].astype(float)
-        pe_ema12 = calculate_ema(pe_close_5, EMA_FAST).iloc[-1]
-        pe_ema20 = calculate_ema(pe_close_5, EMA_SLOW).iloc[-1]
-        pe_close_15 = pe_hist_15["close"].astype(float)
-        pe_ema50_htf = calculate_ema(pe_close_15, EMA_HTF).iloc[-1]
-
-        # compute volumes & ratio on latest 5-min for both
-        def vol_ratio(hist5):
-            vols = hist5["volume"].astype(float)
-            if len(vols) < 11: return 1.0
-            avg_prev10 = vols.iloc[-11:-1].mean()
-            latest_vol = vols.iloc[-1]
-            return latest_vol / avg_prev10 if avg_prev10 > 0 else 1.0
+        # EMAs for CE / PE at the current bar
+        ce_ema12 = ce_hist_5.last("ema_fast")
+        ce_ema50_htf = bars["ce_15"].last("ema_htf")
+        pe_ema12 = pe_hist_5.last("ema_fast")
+        pe_ema50_htf = bars["pe_15"].last("ema_htf")
 
         ce_vol_ratio = vol_ratio(ce_hist_5)
         pe_vol_ratio = vol_ratio(pe_hist_5)
 
-        # determine crossover signals (we detect change-of-relation by looking at last two EMA comparisons)
-        def ema_relation(close_series, efast_period=EMA_FAST, eslow_period=EMA_SLOW):
-            ema_fast = calculate_ema(close_series, efast_period)
-            ema_slow = calculate_ema(close_series, eslow_period)
-            if len(ema_fast) < 2 or len(ema_slow) < 2: return None
-            prev_rel = "above" if ema_fast.iloc[-2] > ema_slow.iloc[-2] else ("below" if ema_fast.iloc[-2] < ema_slow.iloc[-2] else "equal")
-            curr_rel = "above" if ema_fast.iloc[-1] > ema_slow.iloc[-1] else ("below" if ema_fast.iloc[-1] < ema_slow.iloc[-1] else "equal")
-            return prev_rel, curr_rel
-
-        ce_prev_rel, ce_curr_rel = ema_relation(ce_close_5)
-        pe_prev_rel, pe_curr_rel = ema_relation(pe_close_5)
+        ce_prev_rel, ce_curr_rel = ema_relation(ce_hist_5)
+        pe_prev_rel, pe_curr_rel = ema_relation(pe_hist_5)
 
         # decide signals:
         # - CE LONG when EMA crosses above AND CE HTF confirms AND volume spike
@@ -317,8 +333,8 @@ def backtest_one_day(instruments, date):
         trade_lots = 0
 
         # Last bar close price for entry estimation
-        ce_price = float(ce_hist_5.iloc[-1]["close"])
-        pe_price = float(pe_hist_5.iloc[-1]["close"])
+        ce_price = float(ce_hist_5.last("close"))
+        pe_price = float(pe_hist_5.last("close"))
 
         # Determine CE long
         if ce_prev_rel == "below" and ce_curr_rel == "above" and ce_ema12 > ce_ema50_htf and ce_vol_ratio > VOLUME_RATIO_THRESHOLD:
@@ -372,9 +388,9 @@ def backtest_one_day(instruments, date):
                 df_now = ce_hist_5
             else:
                 df_now = pe_hist_5
-            if df_now.empty:
+            if len(df_now) == 0:
                 continue
-            curr_price = float(df_now.iloc[-1]["close"])
+            curr_price = float(df_now.last("close"))
             # check SL hit
             if position["side"] == "BUY":
                 if curr_price <= position["stop_price"]:
@@ -447,48 +463,61 @@ def backtest_one_day(instruments, date):
 
 # ------------------ RUN BACKTEST ------------------
 
+def backtest_one_day(instruments, date):
+    """
+    Simulate the bot running every 5-min for a single trading date.
+    Returns list of trades executed that day (each trade dict includes pnl and timestamps).
+    """
+    return simulate_day(date, fetch_day(instruments, date))
+
+def run_days(instruments, days, fetch_workers=FETCH_WORKERS, sim_workers=SIM_WORKERS, prefetch=PREFETCH_DAYS):
+    """
+    Backtest independent trading days as a pipeline: a thread pool fetches up to
+    `prefetch` days ahead while a process pool simulates the days already fetched,
+    so the run is bounded by the slowest fetch rather than the sum of all of them.
+    A day whose fetch or simulation fails is skipped. Trades come back in day order.
+    """
+    days = list(days)
+    results = {}
+    pending = iter(days)
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+         ProcessPoolExecutor(max_workers=sim_workers) as sim_pool:
+        in_flight = {}  # future -> (stage, day)
+
+        def top_up():
+            while len(in_flight) < prefetch:
+                day = next(pending, None)
+                if day is None:
+                    return
+                in_flight[fetch_pool.submit(fetch_day, instruments, day)] = ("fetch", day)
+
+        top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, day = in_flight.pop(fut)
+                try:
+                    if stage == "fetch":
+                        in_flight[sim_pool.submit(simulate_day, day, fut.result())] = ("simulate", day)
+                    else:
+                        results[day] = fut.result()
+                except Exception as e:
+                    print(f"Skipping {day} due to error: {e}")
+            top_up()
+
+    return [t for day in days for t in results.get(day, [])]
+
 def run_backtest(start_date, end_date):
     # fetch instruments once
     instruments = fetch_instruments()
-    all_trades = []
-    # Loop trading days (Mon-Fri)
-    for dt in rrule.rrule(rrule.DAILY, dtstart=start_date, until=end_date):
-        if dt.weekday() >= 5:
-            continue
-        day = dt.date()
-        try:
-            trades = backtest_one_day(instruments, day)
-            all_trades.extend(trades)
-        except Exception as e:
-            print(f"Skipping {day} due to error: {e}")
+    # Trading days (Mon-Fri)
+    days = [dt.date() for dt in rrule.rrule(rrule.DAILY, dtstart=start_date, until=end_date) if dt.weekday() < 5]
+    all_trades = run_days(instruments, days)
 
     # build DataFrame of trades
     if not all_trades:
         print("No trades executed in the backtest period.")
         return None
-    
-    def run_backtest2(start_date-30, end_date-30):
-        for dt in rrule.rrule(rrule.WEEKLY, dtstart=start_date-30, until=end_date-30):
-        if dt.weekday() >= 6:
-            continue
-        day = dt.date()
-        try:
-            trades = backtest_one_day(instruments, day)
-            all_trades.extend(trades)
-        except Exception as e:
-            print(f"Skipping {day} due to error: {e}")
-
-    def Run_backtest3(start_date-30, end_date-30):
-        for dt in rrule:rrule(rrule.MONTHLY, distance=start_date,unitl=end_date)
-        if dt.weekday() >= 5:
-            continue
-        day = dt.date()
-        try:
-            trades = backtest_one_day(instruments, day)
-            all_trades.extend(trades)
-        except Exception as e:
-            print(f"Skipping {day} due to error: {e}")
-
 
     df = pd.DataFrame(all_trades)
     df["pnl"] = df["pnl"].astype(float)
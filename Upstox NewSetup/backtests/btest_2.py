@@ -9,7 +9,8 @@ import yfinance as yf
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import math
-from scipy.stats import norm
+
+from options_pricing import bs_prices
 
 
 # ==========================================================
@@ -146,57 +147,30 @@ def EMA(series, period):
     return series.ewm(span=period, adjust=False).mean()
 
 def max_drawdown(series):
-    peak = series.iloc[0]
-    maxdd = 0
-    for x in series:
-        if x > peak:
-            peak = x
-        dd = peak - x
-        if dd > maxdd:
-            maxdd = dd
-    return maxdd
+    # largest fall from a running peak (absolute, >= 0)
+    return float((series.cummax() - series).max())
 
 
 # ==========================================================
 # -------- SYNTHETIC OPTION BUILDER (CALL + PUT) ------------
 # ==========================================================
 
-def bs_price(S, K, r, sigma, T, option):
-    if T <= 0:
-        return max(0, (S-K) if option=="call" else (K-S))
-
-    d1 = (math.log(S/K) + (r+0.5*sigma*sigma)*T) / (sigma*math.sqrt(T))
-    d2 = d1 - sigma*math.sqrt(T)
-
-    if option=="call":
-        return S*norm.cdf(d1) - K*math.exp(-r*T)*norm.cdf(d2)
-    else:
-        return K*math.exp(-r*T)*norm.cdf(-d2) - S*norm.cdf(-d1)
-
-
-def make_synthetic_options(df5):
+def make_synthetic_options(df5, dtype=np.float64, chunk=None):
     df = df5.copy()
     df["ret"] = df["close"].pct_change().fillna(0)
     df["sigma"] = df["ret"].rolling(30).std().fillna(0.01) * math.sqrt(252 * 78)
 
     strike_step = 50
-    call_rows, put_rows = [], []
+    S = df["close"].to_numpy(dtype=float)
+    K = np.round(S / strike_step) * strike_step
+    T = 7/365  # 1 week expiry
+    rr = 0.06
 
-    for _, r in df.iterrows():
-        S = r["close"]
-        sigma = r["sigma"]
-        K = round(S / strike_step) * strike_step
-        T = 7/365  # 1 week expiry
-        rr = 0.06
+    call_p, put_p = bs_prices(S, K, rr, df["sigma"].to_numpy(), T, dtype=dtype, chunk=chunk)
+    opt_volume = df["volume"].to_numpy() * 0.001
 
-        call_p = bs_price(S, K, rr, sigma, T, "call")
-        put_p  = bs_price(S, K, rr, sigma, T, "put")
-
-        call_rows.append([r["time"], call_p, r["volume"]*0.001])
-        put_rows.append([r["time"], put_p, r["volume"]*0.001])
-
-    call_df = pd.DataFrame(call_rows, columns=["time","close","volume"])
-    put_df  = pd.DataFrame(put_rows,  columns=["time","close","volume"])
+    call_df = pd.DataFrame({"time": df["time"].to_numpy(), "close": call_p, "volume": opt_volume})
+    put_df  = pd.DataFrame({"time": df["time"].to_numpy(), "close": put_p, "volume": opt_volume})
 
     for df in [call_df, put_df]:
         df["open"] = df["close"].shift(1).fillna(df["close"])
@@ -210,126 +184,109 @@ def make_synthetic_options(df5):
 # --------------------- BACKTEST ENGINE ----------------------
 # ==========================================================
 
-def run_backtest():
-    print("\n==== FINAL BACKTEST STARTED ====")
-
-    # auto-adjust date range
-    adj_start, adj_end = adjust_dates_for_intraday(START_DATE, END_DATE)
-
-    print(f"Fetching 5m data: {adj_start} → {adj_end}")
-    df5 = fetch_intraday_yahoo(TICKER, adj_start, adj_end, "5m")
-
-    print("Fetching 15m data...")
-    df15 = fetch_intraday_yahoo(TICKER, adj_start, adj_end, "15m")
-
-    # EMAs
-    df5["ema12"] = EMA(df5["close"], EMA_FAST)
-    df5["ema20"] = EMA(df5["close"], EMA_SLOW)
-
-    df15["ema50"] = EMA(df15["close"], EMA_HTF)
-    df15_small = df15[["time","ema50"]]
-
-    df5 = pd.merge_asof(df5.sort_values("time"),
-                        df15_small.sort_values("time"),
-                        on="time", direction="backward")
+def day_offsets(dates):
+    """[start, end) row offsets of every trading day in a time-sorted frame."""
+    dates = np.asarray(dates)
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    ends = np.r_[starts[1:], len(dates)]
+    return starts, ends
+
+
+def volume_ratio(volume, window=11):
+    """volume / mean volume of the previous `window` bars (1 if that mean is not > 0).
+
+    Rows without a full window are left at 1; the engine only reads bars
+    from EMA_SLOW on, where the window always lies inside the same day.
+    """
+    vol = np.asarray(volume, dtype=float)
+    ratio = np.ones(len(vol))
+    if len(vol) > window:
+        prev_mean = np.lib.stride_tricks.sliding_window_view(vol, window)[:-1].mean(axis=1)
+        np.divide(vol[window:], prev_mean, out=ratio[window:], where=prev_mean > 0)
+    return ratio
+
+
+def align_rows(times, ref_times):
+    """Row of the last ref_times <= each time (searchsorted, ref_times sorted)."""
+    return np.searchsorted(np.asarray(ref_times), np.asarray(times), side="right") - 1
+
+
+def simulate(df5, call_df=None, put_df=None):
+    """Day-by-day bar loop over precomputed arrays.
+
+    df5 needs time / close / volume / ema12 / ema20 / ema50 / date; in
+    SYN_OPT mode entries are priced from call_df / put_df aligned by time.
+    Returns (trades, equity) as the lists run_backtest reports on.
+    """
+    times = df5["time"].to_numpy()
+    close = df5["close"].to_numpy(dtype=float)
+    ema12 = df5["ema12"].to_numpy(dtype=float)
+    ema20 = df5["ema20"].to_numpy(dtype=float)
+    ema50 = df5["ema50"].to_numpy(dtype=float)
+    dates = df5["date"].to_numpy()
+    starts, ends = day_offsets(dates)
+
+    above = ema12 > ema20
+    prev_above = np.r_[False, above[:-1]]
+    cross_up = ~prev_above & above
+    cross_down = prev_above & ~above
+
+    if MODE == "FUT":
+        spike = volume_ratio(df5["volume"]) > VOLUME_SPIKE
+        signal = np.select([cross_up & (ema12 > ema50) & spike, cross_down & (ema12 < ema50) & spike],
+                           ["LONG_FUT", "SHORT_FUT"], "")
+        entry_px = close
+        lot_size = LOT_SIZE_FUT
+    else:
+        ce_close = call_df["close"].to_numpy(dtype=float)[align_rows(times, call_df["time"])]
+        pe_close = put_df["close"].to_numpy(dtype=float)[align_rows(times, put_df["time"])]
+        signal = np.select([cross_up, cross_down], ["LONG_CE", "LONG_PE"], "")
+        entry_px = np.where(cross_up, ce_close, pe_close)
+        lot_size = LOT_SIZE_OPT
 
-    df5["date"] = df5["time"].dt.date
-
-    # build synthetic options if needed
-    if MODE == "SYN_OPT":
-        call_df, put_df = make_synthetic_options(df5)
-        call_df["ema12"] = EMA(call_df["close"], EMA_FAST)
-        call_df["ema20"] = EMA(call_df["close"], EMA_SLOW)
-        put_df["ema12"]  = EMA(put_df["close"], EMA_FAST)
-        put_df["ema20"]  = EMA(put_df["close"], EMA_SLOW)
+    skip = np.isnan(ema50).tolist()
+    signal = signal.tolist()
+    close_l, entry_l = close.tolist(), entry_px.tolist()
 
     trades = []
     cum_pnl = 0
     equity = []
 
     # LOOP DAYS
-    for day in sorted(df5["date"].unique()):
-        d = df5[df5["date"] == day].reset_index(drop=True)
-        if d.empty: continue
-
+    for lo, hi in zip(starts.tolist(), ends.tolist()):
+        day = dates[lo]
         position = None
 
-        for i, r in d.iterrows():
-
-            if i < EMA_SLOW: continue
-            if pd.isna(r["ema50"]): continue
-
-            prev_rel = "above" if d.loc[i-1,"ema12"] > d.loc[i-1,"ema20"] else "below"
-            curr_rel = "above" if r["ema12"] > r["ema20"] else "below"
-
-            # volume filter
-            vols = d.loc[max(0,i-11):i-1,"volume"]
-            vol_ratio = r["volume"] / vols.mean() if vols.mean()>0 else 1
-
-            signal = None
-
-            if MODE == "FUT":
-                price = r["close"]
-                lot_size = LOT_SIZE_FUT
-
-                if prev_rel=="below" and curr_rel=="above" and r["ema12"]>r["ema50"] and vol_ratio>VOLUME_SPIKE:
-                    signal = "LONG_FUT"
-
-                if prev_rel=="above" and curr_rel=="below" and r["ema12"]<r["ema50"] and vol_ratio>VOLUME_SPIKE:
-                    signal = "SHORT_FUT"
-
-            else:
-                # synthetic CE/PE
-                t = r["time"]
-                ce = call_df[call_df["time"] <= t].iloc[-1]
-                pe = put_df[put_df["time"] <= t].iloc[-1]
-
-                if prev_rel=="below" and curr_rel=="above":
-                    signal = "LONG_CE"
-                    price = ce["close"]; lot_size = LOT_SIZE_OPT
-
-                if prev_rel=="above" and curr_rel=="below":  
-                    signal = "LONG_PE"
-                    price = pe["close"]; lot_size = LOT_SIZE_OPT
+        for i in range(lo + EMA_SLOW, hi):
+            if skip[i]: continue
 
             # ENTRY
-            if signal and position is None:
+            if signal[i] and position is None:
+                price = entry_l[i]
                 lots = int(INVEST_PER_TRADE // (price*lot_size))
                 if lots < 1: continue
 
-                invested = lots * lot_size * price
-                stop_price = price - (INVEST_PER_TRADE*SL_PCT)/(lots*lot_size)
-                tp_price   = price * (1 + TP_PCT)
-
                 position = {
                     "entry_price": price,
-                    "entry_time": r["time"],
+                    "entry_time": times[i],
                     "lots": lots,
                     "lot_size": lot_size,
-                    "stop_price": stop_price,
-                    "tp_price": tp_price,
+                    "stop_price": price - (INVEST_PER_TRADE*SL_PCT)/(lots*lot_size),
+                    "tp_price": price * (1 + TP_PCT),
                     "side": "BUY"
                 }
 
-                print(f"{day} → ENTRY {signal} @ {price:.2f} lots={lots}")
+                print(f"{day} → ENTRY {signal[i]} @ {price:.2f} lots={lots}")
                 continue
 
-            # EXIT LOGIC
+            # EXIT LOGIC (on the underlying close, as before)
             if position:
-                curr = r["close"]
+                curr = close_l[i]
 
-                # stop-loss hit
-                if curr <= position["stop_price"]:
+                # stop-loss / take-profit hit
+                if curr <= position["stop_price"] or curr >= position["tp_price"]:
                     pnl = (curr - position["entry_price"])*position["lots"]*position["lot_size"]
-                    trades.append({"entry":position["entry_time"],"exit":r["time"],"pnl":pnl})
-                    cum_pnl += pnl
-                    position = None
-                    continue
-
-                # take-profit hit
-                if curr >= position["tp_price"]:
-                    pnl = (curr - position["entry_price"])*position["lots"]*position["lot_size"]
-                    trades.append({"entry":position["entry_time"],"exit":r["time"],"pnl":pnl})
+                    trades.append({"entry":position["entry_time"],"exit":times[i],"pnl":pnl})
                     cum_pnl += pnl
                     position = None
                     continue
@@ -340,14 +297,49 @@ def run_backtest():
 
         # EOD close
         if position:
-            exit_price = d.iloc[-1]["close"]
+            exit_price = close_l[hi-1]
             pnl = (exit_price - position["entry_price"])*position["lots"]*position["lot_size"]
-            trades.append({"entry":position["entry_time"],"exit":d.iloc[-1]["time"],"pnl":pnl})
+            trades.append({"entry":position["entry_time"],"exit":times[hi-1],"pnl":pnl})
             cum_pnl += pnl
             position = None
 
         equity.append([day, cum_pnl])
 
+    return trades, equity
+
+
+def run_backtest():
+    print("\n==== FINAL BACKTEST STARTED ====")
+
+    # auto-adjust date range
+    adj_start, adj_end = adjust_dates_for_intraday(START_DATE, END_DATE)
+
+    print(f"Fetching 5m data: {adj_start} → {adj_end}")
+    df5 = fetch_intraday_yahoo(TICKER, adj_start, adj_end, "5m")
+
+    print("Fetching 15m data...")
+    df15 = fetch_intraday_yahoo(TICKER, adj_start, adj_end, "15m")
+
+    # EMAs
+    df5["ema12"] = EMA(df5["close"], EMA_FAST)
+    df5["ema20"] = EMA(df5["close"], EMA_SLOW)
+
+    df15["ema50"] = EMA(df15["close"], EMA_HTF)
+    df15_small = df15[["time","ema50"]]
+
+    df5 = pd.merge_asof(df5.sort_values("time"),
+                        df15_small.sort_values("time"),
+                        on="time", direction="backward")
+
+    df5["date"] = df5["time"].dt.date
+
+    # build synthetic options if needed
+    call_df = put_df = None
+    if MODE == "SYN_OPT":
+        call_df, put_df = make_synthetic_options(df5)
+
+    trades, equity = simulate(df5, call_df, put_df)
+
     # ==========================================================
     # RESULTS
     # ==========================================================
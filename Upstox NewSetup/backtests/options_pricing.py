@@ -0,0 +1,176 @@
+# options_pricing.py
+# Vectorized Black-Scholes pricing, Greeks and implied volatility.
+#
+# Everything works on whole arrays (every bar of every strike at once):
+# inputs broadcast against each other, and the IV solver only keeps
+# iterating on the points that have not converged yet.
+import numpy as np
+from scipy.special import ndtr
+
+# ------------------ CONFIG ------------------
+RISK_FREE = 0.06
+DAYS_PER_YEAR = 365
+IV_LOW = 1e-4       # IV search bracket
+IV_HIGH = 5.0
+IV_TOL = 1e-6       # price tolerance (premium units)
+IV_MAX_ITER = 60
+
+_SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def _npdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def _d1_d2(S, K, r, sigma, T):
+    vol_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vol_t
+    return d1, d1 - vol_t
+
+
+# ------------------ PRICES ------------------
+
+def bs_prices(S, K, r, sigma, T, dtype=np.float64, chunk=None):
+    """Black-Scholes call and put prices for whole arrays at once.
+
+    S, K, r, sigma, T broadcast against each other. T <= 0 gives the
+    intrinsic value. dtype=np.float32 halves memory and bandwidth; chunk
+    (elements) bounds the temporaries for huge inputs.
+    Returns (call, put).
+    """
+    S, K, r, sigma, T = np.broadcast_arrays(*(np.asarray(x, dtype=dtype) for x in (S, K, r, sigma, T)))
+    call = np.empty(S.shape, dtype=dtype)
+    put = np.empty(S.shape, dtype=dtype)
+
+    flat = [a.reshape(-1) for a in (S, K, r, sigma, T, call, put)]
+    n = flat[0].size
+    step = chunk or max(n, 1)
+    for lo in range(0, n, step):
+        s_, k_, r_, v_, t_, c_out, p_out = (a[lo:lo + step] for a in flat)
+        live = t_ > 0
+        t_pos = np.where(live, t_, 1)
+        d1, d2 = _d1_d2(s_, k_, r_, v_, t_pos)
+        disc_k = k_ * np.exp(-r_ * t_pos)
+        c_out[:] = np.where(live, s_ * ndtr(d1) - disc_k * ndtr(d2), np.maximum(s_ - k_, 0))
+        p_out[:] = np.where(live, disc_k * ndtr(-d2) - s_ * ndtr(-d1), np.maximum(k_ - s_, 0))
+    return call, put
+
+
+def option_price(S, K, r, sigma, T, is_call):
+    """Call or put price per element (is_call: bool array or scalar)."""
+    call, put = bs_prices(S, K, r, sigma, T)
+    return np.where(is_call, call, put)
+
+
+# ------------------ GREEKS ------------------
+
+def greeks(S, K, r, sigma, T, is_call, dtype=np.float64):
+    """Delta, gamma, theta and vega for whole arrays.
+
+    theta is per calendar day, vega per 1 vol point (0.01 of sigma).
+    Expired points (T <= 0) get NaN. Returns a dict of arrays.
+    """
+    S, K, r, sigma, T, is_call = np.broadcast_arrays(
+        *(np.asarray(x, dtype=dtype) for x in (S, K, r, sigma, T)), np.asarray(is_call, dtype=bool))
+    live = T > 0
+    t_pos = np.where(live, T, 1)
+    sqrt_t = np.sqrt(t_pos)
+    d1, d2 = _d1_d2(S, K, r, sigma, t_pos)
+    pdf = _npdf(d1)
+    disc_k = K * np.exp(-r * t_pos)
+
+    delta = np.where(is_call, ndtr(d1), ndtr(d1) - 1)
+    gamma = pdf / (S * sigma * sqrt_t)
+    theta = -S * pdf * sigma / (2 * sqrt_t) - np.where(is_call, r * disc_k * ndtr(d2), -r * disc_k * ndtr(-d2))
+    vega = S * pdf * sqrt_t
+
+    out = {"delta": delta, "gamma": gamma, "theta": theta / DAYS_PER_YEAR, "vega": vega / 100}
+    return {k: np.where(live, v, np.nan).astype(dtype, copy=False) for k, v in out.items()}
+
+
+# ------------------ IMPLIED VOLATILITY ------------------
+
+def implied_vol(price, S, K, r, T, is_call, tol=IV_TOL, max_iter=IV_MAX_ITER,
+                low=IV_LOW, high=IV_HIGH, dtype=np.float64):
+    """Implied volatility for whole arrays of option prices.
+
+    Newton steps safeguarded by a per-point bisection bracket [low, high]:
+    a step that leaves the bracket (or has a vanishing vega) is replaced by
+    the bracket midpoint, so every point converges. Each iteration only
+    works on the points still unconverged.
+
+    Points that cannot be inverted - expired, no time value left above the
+    no-arbitrage lower bound (within tol), price above the upper bound, an
+    implied vol outside [low, high], or not converged within max_iter - are
+    NaN.
+    """
+    price, S, K, r, T, is_call = np.broadcast_arrays(
+        *(np.asarray(x, dtype=dtype) for x in (price, S, K, r, T)), np.asarray(is_call, dtype=bool))
+    shape = price.shape
+    price, S, K, r, T, is_call = (a.reshape(-1) for a in (price, S, K, r, T, is_call))
+    iv = np.full(price.size, np.nan, dtype=dtype)
+
+    # no-arbitrage bounds
+    disc_k = K * np.exp(-r * np.where(T > 0, T, 0))
+    lower = np.where(is_call, np.maximum(S - disc_k, 0), np.maximum(disc_k - S, 0))
+    upper = np.where(is_call, S, disc_k)
+    idx = np.flatnonzero((T > 0) & (price > lower + tol) & (price < upper))
+    if idx.size == 0:
+        return iv.reshape(shape)
+
+    # the bracket must contain the root, or the bisection ends on its edge
+    inside = ((option_price(S[idx], K[idx], r[idx], low, T[idx], is_call[idx]) <= price[idx])
+              & (price[idx] <= option_price(S[idx], K[idx], r[idx], high, T[idx], is_call[idx])))
+    idx = idx[inside]
+    if idx.size == 0:
+        return iv.reshape(shape)
+
+    p, s, k, rr, t, c = price[idx], S[idx], K[idx], r[idx], T[idx], is_call[idx]
+    lo = np.full(idx.size, low, dtype=dtype)
+    hi = np.full(idx.size, high, dtype=dtype)
+    # Brenner-Subrahmanyam starting point
+    sigma = np.clip(np.sqrt(2 * np.pi / t) * p / s, low, high)
+
+    for _ in range(max_iter):
+        d1, d2 = _d1_d2(s, k, rr, sigma, t)
+        disc = k * np.exp(-rr * t)
+        model = np.where(c, s * ndtr(d1) - disc * ndtr(d2), disc * ndtr(-d2) - s * ndtr(-d1))
+        diff = model - p
+        done = (np.abs(diff) < tol) | (hi - lo < tol * 1e-3)
+        if done.any():
+            iv[idx[done]] = sigma[done]
+            keep = ~done
+            idx, p, s, k, rr, t, c = idx[keep], p[keep], s[keep], k[keep], rr[keep], t[keep], c[keep]
+            sigma, lo, hi, diff, d1 = sigma[keep], lo[keep], hi[keep], diff[keep], d1[keep]
+            if idx.size == 0:
+                break
+
+        # price is increasing in sigma: shrink the bracket
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff < 0, sigma, lo)
+
+        vega = s * _npdf(d1) * np.sqrt(t)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton = sigma - diff / vega
+        ok = (vega > 1e-12) & (newton > lo) & (newton < hi)
+        sigma = np.where(ok, newton, 0.5 * (lo + hi))
+
+    return iv.reshape(shape)
+
+
+# ------------------ CANDLE FEATURES ------------------
+
+def option_features(option_close, spot, strike, times, expiry, is_call, r=RISK_FREE):
+    """IV and Greeks for every bar of an option candle series (or chain).
+
+    option_close / spot / strike broadcast; times and expiry are datetimes
+    (expiry at its settlement time). Returns a dict with T (years), iv and
+    delta / gamma / theta / vega evaluated at the bar's own IV.
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    expiry = np.asarray(expiry, dtype="datetime64[ns]")
+    T = (expiry - times) / np.timedelta64(1, "D") / DAYS_PER_YEAR
+    iv = implied_vol(option_close, spot, strike, r, T, is_call)
+    out = {"T": T, "iv": iv}
+    out.update(greeks(spot, strike, r, iv, T, is_call))
+    return out
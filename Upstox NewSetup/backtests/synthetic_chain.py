@@ -0,0 +1,163 @@
+# synthetic_chain.py
+# Synthetic NIFTY option chain: every 5m bar x a ladder of strikes around
+# ATM x the next few weekly expiries, priced in one broadcast Black-Scholes
+# pass and cached on disk so strike-selection rules can be backtested
+# offline without broker data.
+#
+#   chain = load_or_build(df5)            # df5: time / close like btest_2
+#   chain["call"][bar, ATM + 2, 0]        # 2 strikes OTM, current week
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from options_pricing import RISK_FREE, bs_prices
+
+# ------------------ CONFIG ------------------
+CACHE_DIR = "chain_cache"
+STRIKE_STEP = 50
+N_STRIKES = 10                 # strikes each side of ATM -> 2N+1 columns
+N_EXPIRIES = 4                 # nearest weekly expiries
+EXPIRY_WEEKDAY = 3             # Thursday (NIFTY weekly); Tuesday = 1
+EXPIRY_TIME = "15:30"
+CHUNK_BARS = 20000             # bars priced per pass
+DTYPE = np.float32
+
+
+# ------------------ INPUTS ------------------
+
+def rolling_sigma(close, window=30, bars_per_year=252 * 78):
+    """Annualized rolling-return volatility, as in btest_2.make_synthetic_options."""
+    ret = pd.Series(close).pct_change().fillna(0)
+    return (ret.rolling(window).std().fillna(0.01) * math.sqrt(bars_per_year)).to_numpy()
+
+
+def weekly_expiries(start, end, weekday=EXPIRY_WEEKDAY, expiry_time=EXPIRY_TIME, holidays=(), weeks_ahead=N_EXPIRIES):
+    """Weekly expiry timestamps covering [start, end] plus weeks_ahead extra weeks.
+
+    An expiry falling on a holiday moves to the previous weekday.
+    """
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize() + pd.Timedelta(weeks=weeks_ahead + 1)
+    days = pd.date_range(start, end, freq="D")
+    days = days[days.weekday == weekday]
+    holidays = set(pd.to_datetime(list(holidays)).normalize())
+    out = []
+    for d in days:
+        while d in holidays or d.weekday() >= 5:
+            d -= pd.Timedelta(days=1)
+        out.append(d + pd.Timedelta(expiry_time + ":00"))
+    return pd.DatetimeIndex(out)
+
+
+# ------------------ BUILD ------------------
+
+def build_chain(times, spot, sigma=None, n_strikes=N_STRIKES, strike_step=STRIKE_STEP,
+                n_expiries=N_EXPIRIES, expiries=None, r=RISK_FREE, dtype=DTYPE, chunk_bars=CHUNK_BARS):
+    """Price the whole chain.
+
+    Returns a dict of arrays:
+      call, put   (bars x strikes x expiries) premiums
+      strike      (bars x strikes) strike ladder; column n_strikes is ATM
+      expiry      (bars x expiries) expiry timestamps (datetime64[ns])
+      time        (bars,) bar timestamps
+    Time to expiry is measured from each bar to its expiry's settlement
+    time, so premiums decay through the day and jump to the next week
+    once an expiry has passed.
+    """
+    times = pd.DatetimeIndex(times)
+    spot = np.asarray(spot, dtype=np.float64)
+    sigma = rolling_sigma(spot) if sigma is None else np.asarray(sigma, dtype=np.float64)
+    if expiries is None:
+        expiries = weekly_expiries(times[0], times[-1], weeks_ahead=n_expiries)
+    expiries = np.asarray(pd.DatetimeIndex(expiries).sort_values(), dtype="datetime64[ns]")
+    t_ns = np.asarray(times, dtype="datetime64[ns]")
+
+    # nearest expiry still ahead of each bar, then the following ones
+    first = np.searchsorted(expiries, t_ns, side="left")
+    exp_idx = first[:, None] + np.arange(n_expiries)
+    if exp_idx.max() >= len(expiries):
+        raise ValueError("Expiry calendar ends before the last bar's expiries")
+    expiry = expiries[exp_idx]
+    T = (expiry - t_ns[:, None]) / np.timedelta64(1, "D") / 365
+
+    atm = np.round(spot / strike_step) * strike_step
+    strike = atm[:, None] + strike_step * np.arange(-n_strikes, n_strikes + 1)
+
+    n = len(spot)
+    call = np.empty((n, strike.shape[1], n_expiries), dtype=dtype)
+    put = np.empty_like(call)
+    for lo in range(0, n, chunk_bars):
+        hi = min(lo + chunk_bars, n)
+        call[lo:hi], put[lo:hi] = bs_prices(
+            spot[lo:hi, None, None], strike[lo:hi, :, None], r, sigma[lo:hi, None, None], T[lo:hi, None, :],
+            dtype=dtype,
+        )
+    return {"call": call, "put": put, "strike": strike, "expiry": expiry, "time": t_ns}
+
+
+# ------------------ CACHE ------------------
+
+def _digest(value):
+    """Array-valued params by the hash of their full contents (str() truncates long arrays)."""
+    if not isinstance(value, (np.ndarray, pd.Index, pd.Series)):
+        return value
+    a = np.asarray(value)
+    if a.dtype.kind == "M":
+        a = a.astype("datetime64[ns]")
+    data = "\n".join(map(repr, a.tolist())).encode() if a.dtype.kind == "O" else np.ascontiguousarray(a).tobytes()
+    return f"{a.dtype.str}{a.shape}:{hashlib.sha1(data).hexdigest()}"
+
+
+def cache_key(times, spot, **params):
+    h = hashlib.sha1()
+    h.update(np.asarray(times, dtype="datetime64[ns]").tobytes())
+    h.update(np.asarray(spot, dtype=np.float64).tobytes())
+    params = {name: _digest(value) for name, value in params.items()}
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def load_or_build(df5, cache_dir=CACHE_DIR, **params):
+    """Chain for a 5m frame (time / close columns), memory-mapped from the cache if built before."""
+    times, spot = df5["time"].to_numpy(), df5["close"].to_numpy(dtype=np.float64)
+    sigma = params.pop("sigma", None)
+    path = os.path.join(cache_dir, cache_key(times, spot, sigma=sigma, **params))
+
+    names = ["call", "put", "strike", "expiry", "time"]
+    if all(os.path.exists(os.path.join(path, f"{name}.npy")) for name in names):
+        return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
+
+    chain = build_chain(times, spot, sigma=sigma, **params)
+    os.makedirs(path, exist_ok=True)
+    for name in names:
+        np.save(os.path.join(path, f"{name}.npy"), chain[name])
+    return chain
+
+
+def option_series(chain, kind="call", strike_offset=0, expiry_index=0):
+    """Premium series for one ladder position, e.g. ATM+1 current-week calls."""
+    n_strikes = chain["strike"].shape[1] // 2
+    return np.asarray(chain[kind][:, n_strikes + strike_offset, expiry_index])
+
+
+if __name__ == "__main__":
+    import time
+
+    bars = pd.date_range("2022-01-03 09:15", "2024-12-31 15:25", freq="5min")
+    bars = bars[(bars.weekday < 5) & (bars.time >= pd.Timestamp("09:15").time())
+                & (bars.time <= pd.Timestamp("15:25").time())]
+    rng = np.random.default_rng(0)
+    df5 = pd.DataFrame({"time": bars, "close": 18000 * np.exp(np.cumsum(rng.normal(0, 0.0008, len(bars))))})
+
+    t = time.time()
+    chain = load_or_build(df5)
+    print(f"Chain {chain['call'].shape} ({chain['call'].nbytes / 1e6:.0f} MB per side) in {time.time() - t:.2f}s")
+    print(pd.DataFrame({
+        "spot": df5["close"].to_numpy(),
+        "ATM CE (wk0)": option_series(chain, "call"), "ATM PE (wk0)": option_series(chain, "put"),
+        "ATM+2 CE (wk1)": option_series(chain, "call", 2, 1),
+    }, index=df5["time"]).tail(10).round(2).to_string())
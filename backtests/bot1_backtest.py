@@ -15,6 +15,7 @@ ema_slow = 20
 initial_capital = 1000  # USD
 fee_rate = 0.00075  # 0.075% per side
 slippage_rate = 0.0002  # 0.02% per trade
+periods_per_year = 365 * 24 * 12  # 5m bars; crypto trades every day of the year
 
 # --------------------------
 # FETCH HISTORICAL DATA
@@ -67,9 +68,9 @@ df["Equity"] = (1 + df["Strategy_Return"]).cumprod()
 # METRICS
 # --------------------------
 total_return = df["Equity"].iloc[-1] - 1
-cagr = (df["Equity"].iloc[-1]) ** (252*24*12 / len(df)) - 1
+cagr = (df["Equity"].iloc[-1]) ** (periods_per_year / len(df)) - 1
 max_dd = (df["Equity"] / df["Equity"].cummax() - 1).min()
-sharpe = (df["Strategy_Return"].mean() / df["Strategy_Return"].std()) * np.sqrt(252*24*12)
+sharpe = (df["Strategy_Return"].mean() / df["Strategy_Return"].std()) * np.sqrt(periods_per_year)
 
 print("\n--- PERFORMANCE METRICS ---")
 print(f"Total Return: {total_return*100:.2f}%")
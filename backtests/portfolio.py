@@ -0,0 +1,190 @@
+# =============================
+# EMA + Volume Spike Portfolio Backtest
+# =============================
+# bot3_backtest1.py's logic over a whole universe of symbols. Each symbol's
+# trade stream only depends on its own candles, so symbols are simulated in
+# parallel (one worker per chunk of symbols) and the streams are merged
+# afterwards into one time-ordered ledger that shares a single capital pool.
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+# the bot3 rules live in one place, next to the other batched backtests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "New SStrategyMC Backtests"))
+import ema_strategies  # noqa: E402
+
+# === CONFIG ===
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))   # one CSV per symbol, e.g. BTC_USD_5m.csv
+FILE_SUFFIX = "_5m.csv"
+EMA_SHORT = 12
+EMA_LONG = 20
+VOLUME_WINDOW = 10
+VOLUME_SPIKE_RATIO = 1.5
+STOP_LOSS_PCT = 0.01  # 1%
+START_BALANCE = 10000
+ALLOCATION_PCT = 0.05             # notional per trade as a share of current equity
+CHUNKS_PER_WORKER = 4
+REQUIRED_COLUMNS = {"timestamp", "close", "volume"}
+TRADE_COLUMNS = ["symbol", "side", "entry_price", "exit_price", "reason", "entry_time", "exit_time", "return"]
+
+
+# === DATA ===
+def _usable(path):
+    """True if the CSV has a header with the columns load_symbol needs (empty files do not)."""
+    try:
+        return REQUIRED_COLUMNS <= set(pd.read_csv(path, nrows=0).columns)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+        return False
+
+
+def list_universe(data_dir=DATA_DIR, suffix=FILE_SUFFIX):
+    """{symbol: csv path} for every usable CSV in data_dir (BTC_USD_5m.csv -> BTC/USD).
+
+    Empty files and files without timestamp / close / volume columns are
+    skipped with a note.
+    """
+    universe = {}
+    for f in sorted(glob.glob(os.path.join(data_dir, f"*{suffix}"))):
+        if _usable(f):
+            universe[os.path.basename(f)[:-len(suffix)].replace("_", "/")] = f
+        else:
+            print(f"Skipping {f}: empty or missing columns {sorted(REQUIRED_COLUMNS)}")
+    return universe
+
+
+def load_symbol(path):
+    # CSV must have columns: ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+    df = pd.read_csv(path, parse_dates=["timestamp"])
+    return df.sort_values("timestamp").reset_index(drop=True)
+
+
+# === SIGNALS ===
+def signals(df):
+    """Same signal column as bot3_backtest1.py (ta's EMAIndicator == ewm(min_periods=window))."""
+    ema12 = df["close"].ewm(span=EMA_SHORT, min_periods=EMA_SHORT, adjust=False).mean()
+    ema20 = df["close"].ewm(span=EMA_LONG, min_periods=EMA_LONG, adjust=False).mean()
+    vol_ratio = df["volume"] / df["volume"].rolling(window=VOLUME_WINDOW).mean()
+    return ema_strategies.volume_spike_signal(ema12, ema20, vol_ratio, VOLUME_SPIKE_RATIO)
+
+
+# === PER-SYMBOL BACKTEST ===
+def symbol_trades(df):
+    """Closed trades of the bot3 stop / reverse loop, per unit of size."""
+    t = ema_strategies.stop_reverse_trades(df["close"], signals(df), STOP_LOSS_PCT)
+    times = df["timestamp"].to_numpy()
+    trades = pd.DataFrame({
+        "side": t["side"],
+        "entry_price": t["entry_price"],
+        "exit_price": t["exit_price"],
+        "reason": np.where(t["reason"] == ema_strategies.EXIT_STOP, "stop", "reverse"),
+        "entry_time": times[t["entry_idx"]],
+        "exit_time": times[t["exit_idx"]],
+    })
+    trades["return"] = (trades["exit_price"] / trades["entry_price"] - 1) * trades["side"]
+    return trades
+
+
+def _run_chunk(universe):
+    """Worker: load and backtest a chunk of symbols."""
+    out = []
+    for symbol, path in universe:
+        trades = symbol_trades(load_symbol(path))
+        trades.insert(0, "symbol", symbol)
+        out.append(trades)
+    return pd.concat(out, ignore_index=True) if out else pd.DataFrame(columns=TRADE_COLUMNS)
+
+
+def run_universe(universe, workers=None):
+    """All symbols' trade streams, computed across a process pool (empty frame for no symbols)."""
+    workers = workers or os.cpu_count()
+    items = list(universe.items())
+    if not items:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+    chunks = [c for c in np.array_split(np.arange(len(items)), workers * CHUNKS_PER_WORKER) if len(c)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_run_chunk, [[items[i] for i in c] for c in chunks]))
+    return pd.concat(parts, ignore_index=True)
+
+
+# === SHARED-CAPITAL LEDGER ===
+def build_ledger(trades, start_balance=START_BALANCE, allocation_pct=ALLOCATION_PCT):
+    """Replay every symbol's trades in time order against one capital pool.
+
+    Each entry commits allocation_pct of the current (realized) equity as
+    notional; an entry that does not fit in the uncommitted capital is
+    skipped. At equal timestamps exits are processed before entries, so a
+    reversal frees its capital before re-entering.
+
+    Returns (ledger, trades) - ledger has one row per executed open / close,
+    trades gains qty, pnl and a taken flag.
+    """
+    n = len(trades)
+    times = np.concatenate([trades["exit_time"].to_numpy(), trades["entry_time"].to_numpy()])
+    kind = np.concatenate([np.zeros(n, dtype=np.int8), np.ones(n, dtype=np.int8)])   # 0 close, 1 open
+    trade_no = np.concatenate([np.arange(n), np.arange(n)])
+    order = np.lexsort((trade_no, kind, times))
+
+    entry_price = trades["entry_price"].tolist()
+    exit_price = trades["exit_price"].tolist()
+    side = trades["side"].tolist()
+    symbol = trades["symbol"].tolist()
+
+    equity = start_balance
+    committed = 0.0
+    qty = np.zeros(n)
+    pnl = np.zeros(n)
+    taken = np.zeros(n, dtype=bool)
+    ledger = []
+    for e in order.tolist():
+        t = trade_no[e]
+        if kind[e] == 1:
+            notional = equity * allocation_pct
+            if notional <= 0 or committed + notional > equity:
+                continue
+            taken[t] = True
+            qty[t] = notional / entry_price[t]
+            committed += notional
+            ledger.append((times[e], symbol[t], "open", side[t], entry_price[t], qty[t], 0.0, equity, committed))
+        elif taken[t]:
+            pnl[t] = (exit_price[t] - entry_price[t]) * qty[t] * side[t]
+            committed -= qty[t] * entry_price[t]
+            equity += pnl[t]
+            ledger.append((times[e], symbol[t], "close", side[t], exit_price[t], qty[t], pnl[t], equity, committed))
+
+    ledger = pd.DataFrame(ledger, columns=["time", "symbol", "action", "side", "price", "qty", "pnl",
+                                           "equity", "committed"])
+    trades = trades.assign(qty=qty, pnl=pnl, taken=taken)
+    return ledger, trades
+
+
+if __name__ == "__main__":
+    universe = list_universe()
+    if not universe:
+        raise SystemExit(f"No usable *{FILE_SUFFIX} files in {DATA_DIR} "
+                         f"(one CSV per symbol with columns {sorted(REQUIRED_COLUMNS)})")
+    print(f"Backtesting {len(universe)} symbols on {os.cpu_count()} cores")
+
+    trades = run_universe(universe)
+    ledger, trades = build_ledger(trades)
+    taken = trades[trades["taken"]]
+
+    final = ledger["equity"].iloc[-1] if not ledger.empty else START_BALANCE
+    print(f"\n💰 Final Balance: ${final:.2f}")
+    print(f"📊 Total PnL: {taken['pnl'].sum():.2f}")
+    print(f"✅ Win Rate: {(taken['pnl'] > 0).mean() * 100 if len(taken) else 0:.2f}%")
+    print(f"📈 Trades Taken: {len(taken)} / {len(trades)} signalled")
+    print(taken.groupby("symbol")["pnl"].agg(["count", "sum"]).sort_values("sum").tail(10))
+
+    closes = ledger[ledger["action"] == "close"]
+    plt.figure(figsize=(12,6))
+    plt.plot(closes["time"], closes["equity"], label="Portfolio Equity")
+    plt.title(f"EMA + Volume Spike Portfolio ({len(universe)} symbols)")
+    plt.xlabel("Time")
+    plt.ylabel("Balance (USD)")
+    plt.legend()
+    plt.show()